@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Simulador de hora pico sin pantalla: los pedidos llegan como proceso de Poisson a la tasa pedida
+# (pedidos/min, en tiempo real). Cada llegada repite lo que hace la caja:
+#   add_item_to_cart (1-4 veces) -> save_order_final -> refresh_home
+# y cuando el pedido sale de cocina: process_payment -> refresh_home.
+# El bucle principal hace de hilo de la UI (dueño de la conexión escritora); refresh_home consulta
+# en un hilo de carga y el diff del tablero se aplica en el bucle cuando llega, igual que DataLoader
+# (un refresco nuevo descarta el resultado del anterior).
+# Pasa por OrderService, la misma API que llaman las pantallas.
+# Uso: python bench_rush.py --rates 30,60,120,600 --duration 30 [--prefill 10000] [--write-behind] [--json out.json]
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from database import Database, apply_board_diff
+from service import OrderService
+from bench_suite import FOODS, CUTS, VARIANTS, SODAS, DELIVERY, NAMES, generate
+
+FRAME_MS = 1000 / 60  # Presupuesto de un frame a 60 fps
+
+def percentile(values, p):
+    if not values: return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))], 3)
+
+def db_size(db):
+    # Tamaño del archivo principal con el WAL ya volcado (el WAL crece a saltos y mete ruido)
+    db.flush()
+    with db.lock: db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return os.path.getsize(db.path)
+
+class Rush:
+    def __init__(self, db, rate, duration, service, seed):
+        self.db = db; self.orders = OrderService(db); self.rate = rate; self.duration = duration; self.service = service
+        self.rnd = random.Random(seed)
+        self.loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="loader")
+        self.board = [{"order_id": o.id, "customer_name": o.customer_name, "order_details": o.details, "total_price": o.price}
+                      for o in db.get_active_orders()]
+        self.steps = {k: [] for k in ["add_item_to_cart", "save_order_final", "process_payment", "refresh_home", "refresh_home (UI)"]}
+        self.ui = []; self.lag = []; self.saved = 0; self.paid = 0
+        self.token = 0; self.pending = []  # (token, inicio, future) de los refrescos en vuelo
+
+    def timed(self, step, fn, *args):
+        t = time.perf_counter(); result = fn(*args)
+        ms = (time.perf_counter() - t) * 1000; self.steps[step].append(ms)
+        return result, ms
+
+    def add_item_to_cart(self, cart):
+        q = self.rnd.choice([1, 1, 1, 2, 3])
+        cart.extend(self.orders.cart_lines(self.rnd.choice(FOODS), self.rnd.choice(CUTS), self.rnd.choice(VARIANTS),
+                                            self.rnd.choice(SODAS) if self.rnd.random() < 0.3 else "Ninguna", q, q))
+        self.orders.cart_total(cart)
+
+    def save_order_final(self, cart):
+        delivery = self.rnd.choice(DELIVERY); moto = self.rnd.choice(["5", "7"]) if delivery.endswith("(Moto)") else ""
+        return self.orders.save_order(self.rnd.choice(NAMES), cart, delivery, moto)
+
+    def fetch_active(self):
+        self.db.wait_for_writes(Database.COMMIT_WINDOW * 4)
+        return self.db.get_active_orders()
+
+    def refresh_home(self):
+        self.token += 1
+        self.pending.append((self.token, time.perf_counter(), self.loader.submit(self.fetch_active)))
+
+    def deliver(self):
+        # Lo que haría Clock en el próximo frame: aplica los refrescos terminados (solo el más nuevo cuenta)
+        for item in [p for p in self.pending if p[2].done()]:
+            self.pending.remove(item); token, t, fut = item
+            if token != self.token: continue
+            _, ui_ms = self.timed("refresh_home (UI)", apply_board_diff, self.board, fut.result())
+            self.steps["refresh_home"].append((time.perf_counter() - t) * 1000); self.ui.append(ui_ms)
+
+    def idle_until(self, t):
+        while True:
+            self.deliver()
+            left = t - time.perf_counter()
+            if left <= 0: return
+            time.sleep(min(left, 0.001))
+
+    def run(self):
+        start = time.perf_counter(); events = [(self.rnd.expovariate(self.rate / 60), "arrive", None)]
+        while events:
+            at, kind, oid = heapq.heappop(events)
+            late = time.perf_counter() - (start + at)
+            if late > 0: self.lag.append(late * 1000)  # Atraso: la caja no dio abasto con lo anterior
+            else: self.idle_until(start + at)
+            if kind == "arrive":
+                cart = []; ui = 0
+                for _ in range(self.rnd.randint(1, 4)): ui += self.timed("add_item_to_cart", self.add_item_to_cart, cart)[1]
+                while not cart: self.add_item_to_cart(cart)  # Ninguna + Ninguna no agrega nada
+                oid, ms = self.timed("save_order_final", self.save_order_final, cart); ui += ms
+                self.refresh_home(); self.ui.append(ui); self.saved += 1
+                heapq.heappush(events, (at + self.rnd.expovariate(1 / self.service), "pay", oid))
+                nxt = at + self.rnd.expovariate(self.rate / 60)
+                if nxt < self.duration: heapq.heappush(events, (nxt, "arrive", None))
+            else:
+                ui = self.timed("process_payment", self.orders.close_order, oid, self.rnd.choice(["EFECTIVO", "QR"]))[1]
+                self.refresh_home(); self.ui.append(ui); self.paid += 1
+        while self.pending: self.idle_until(time.perf_counter() + 0.01)
+        elapsed = time.perf_counter() - start
+        self.loader.shutdown()
+        return {
+            "rate_per_min": self.rate, "elapsed_s": round(elapsed, 2),
+            "saved_per_min": round(self.saved / elapsed * 60, 1), "paid_per_min": round(self.paid / elapsed * 60, 1),
+            "frame_misses_pct": round(100 * sum(u > FRAME_MS for u in self.ui) / max(1, len(self.ui)), 2),
+            "lag_p95_ms": percentile(self.lag, 95) or 0.0,
+            "steps": {k: {"n": len(v), "p50_ms": percentile(v, 50), "p95_ms": percentile(v, 95), "p99_ms": percentile(v, 99)}
+                      for k, v in self.steps.items()}}
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulador de hora pico de Pollos RR-J")
+    ap.add_argument("--rates", default="30,60,120,600", help="pedidos por minuto a probar")
+    ap.add_argument("--duration", type=float, default=30, help="segundos de llegadas por tasa")
+    ap.add_argument("--service", type=float, default=10, help="segundos promedio hasta el cobro")
+    ap.add_argument("--prefill", type=int, default=10000, help="historial previo en la base")
+    ap.add_argument("--write-behind", action="store_true", help="usar commit agrupado (POLLOS_WRITE_BEHIND)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="guardar los resultados en este archivo")
+    args = ap.parse_args()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pollos_rush_") as tmp:
+        for rate in [float(r) for r in args.rates.split(",")]:
+            path = os.path.join(tmp, f"rush_{rate:g}.db")
+            generate(path, args.prefill, args.seed).close()
+            db = Database(path, write_behind=args.write_behind); before = db_size(db)
+            res = Rush(db, rate, args.duration, args.service, args.seed).run()
+            after = db_size(db)
+            res["db_growth_bytes"] = after - before
+            res["bytes_per_order"] = round((after - before) / max(1, res["steps"]["save_order_final"]["n"]))
+            db.close(); results.append(res)
+            s = res["steps"]
+            print(f"{rate:>6g}/min  guardados {res['saved_per_min']:>6}/min  cobrados {res['paid_per_min']:>6}/min  "
+                  f"frames perdidos {res['frame_misses_pct']:>5}%  atraso p95 {res['lag_p95_ms']:>7} ms  "
+                  f"+{res['db_growth_bytes'] / 1024:.0f} KiB ({res['bytes_per_order']} B/pedido)")
+            for k, v in s.items():
+                print(f"    {k:<20} n={v['n']:<5} p50={v['p50_ms']} p95={v['p95_ms']} p99={v['p99_ms']} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"write_behind": args.write_behind, "prefill": args.prefill, "results": results}, f, ensure_ascii=False, indent=1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+# Benchmark de arranque en frío: cada corrida es un proceso nuevo que importa main.py,
+# construye la app y mide hasta el primer frame dibujado (luego cierra la app).
+# Uso: python bench_startup.py [corridas] [ruta_db_a_copiar]
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODES = {"eager": {}, "lazy": {"POLLOS_LAZY_SCREENS": "1"}}
+
+def child():
+    t0 = time.perf_counter()
+    sys.path.insert(0, HERE)
+    import main
+    from kivy.clock import Clock
+    t_import = time.perf_counter()
+    app = main.PollosApp()
+    marks = {}
+    def first_frame(dt):
+        marks["frame"] = time.perf_counter(); app.stop()
+    def on_start(*args):
+        marks["start"] = time.perf_counter(); Clock.schedule_once(first_frame, 0)
+    app.bind(on_start=on_start)
+    app.run()
+    print(json.dumps({"import": t_import - t0, "build": marks["start"] - t_import, "first_frame": marks["frame"] - t0}))
+
+def run(mode, workdir):
+    env = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1", **MODES[mode])
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], cwd=workdir, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp(prefix="pollos_bench_")
+    # Se mide contra una copia de la base (nunca la real); sin copia se usa una base vacía
+    if len(sys.argv) > 2: shutil.copy(sys.argv[2], os.path.join(workdir, "pollos_rrj_v18.db"))
+    try:
+        run("eager", workdir)  # calentamiento: crea/migra el esquema y llena la caché del SO
+        results = {mode: [run(mode, workdir) for _ in range(runs)] for mode in MODES}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"{'modo':<8}{'import (ms)':>14}{'build (ms)':>14}{'1er frame (ms)':>17}")
+    for mode, rs in results.items():
+        med = {k: statistics.median(r[k] for r in rs) * 1000 for k in rs[0]}
+        print(f"{mode:<8}{med['import']:>14.1f}{med['build']:>14.1f}{med['first_frame']:>17.1f}")
+
+if __name__ == '__main__':
+    child() if "--child" in sys.argv else main()
@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import itertools
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+# Micro-benchmarks sin pantalla: genera historiales sintéticos en una base temporal y mide cada
+# método de Database y el camino de datos de cada pantalla. Resultado en JSON para comparar versiones.
+# Uso: python bench_suite.py --sizes 1000,10000,100000 --out hoy.json [--compare antes.json]
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from database import Database, PAGE_SIZE, apply_board_diff, load_report, next_page_key, report_ranges, to_ts
+from pricing import item_prices, order_summary
+from service import OrderService
+
+FOODS = ["Pollo Broaster", "Pollo a la Plancha", "Hamburguesa", "Salchipapa", "Solo Porción", "Ninguna"]
+CUTS = ["Ala", "Pierna", "Contra", "Pecho"]
+VARIANTS = ["Normal (Arroz y Papa)", "Solo Papa", "Solo Arroz", "Ninguna"]
+SODAS = ["Ninguna", "Mendocina 3L", "Mendocina 1L", "Coca 3L", "Coca Peque", "Oro Peque"]
+DELIVERY = ["Para Mesa", "Para Llevar (Persona)", "Para Llevar (Moto)"]
+NAMES = ["Doña Carmen", "Don José", "María", "Pedro Pérez", "Lucía", "Cliente", "Juan", "Rosa", "Ana", "Carlos"]
+QUICK_FILTERS = ["Hoy", "Última Semana", "Último Mes", "Último Año", "Ninguno"]
+ACTIVE_ORDERS = 15   # Pedidos abiertos en el tablero, como en un turno normal
+YEARS = 3            # Historial repartido en los últimos 3 años
+
+def random_cart(rnd):
+    # Igual que AddOrderScreen: 1 a 4 líneas, comida o soda con su cantidad
+    cart = []
+    for _ in range(rnd.randint(1, 4)):
+        fp, fd, sp, sd = item_prices(rnd.choice(FOODS), rnd.choice(CUTS), rnd.choice(VARIANTS),
+                                     rnd.choice(SODAS) if rnd.random() < 0.3 else "Ninguna")
+        q = rnd.choice([1, 1, 1, 2, 3])
+        if fp: cart.append({"qty": q, "desc": fd, "unit_price": fp, "price": fp * q})
+        if sp: cart.append({"qty": q, "desc": sd, "unit_price": sp, "price": sp * q})
+    return cart or [{"qty": 1, "desc": "Pollo Pierna", "unit_price": 16, "price": 16}]
+
+def generate(path, n, seed=1):
+    # n pedidos: ~88% ENTREGADO, ~10% FIADO y el resto ACTIVO, con fechas en los últimos YEARS años
+    rnd = random.Random(seed)
+    db = Database(path, write_behind=True)
+    now = int(time.time()); span = YEARS * 365 * 86400; dates = []
+    for i in range(n):
+        delivery = rnd.choice(DELIVERY); moto = rnd.choice([5, 7, 10]) if delivery.endswith("(Moto)") else 0
+        cart = random_cart(rnd); total, details = order_summary(cart, moto or None, delivery)
+        db.add_order(rnd.choice(NAMES) + ("" if rnd.random() < 0.6 else f" {i % 500}"), details, total, delivery, moto, cart)
+        created = now - rnd.randint(0, span)
+        if i >= n - ACTIVE_ORDERS: dates.append(("ACTIVO", "PENDIENTE", now - rnd.randint(0, 3600), None, i + 1))
+        elif rnd.random() < 0.10: dates.append(("FIADO", "FIADO", created, None, i + 1))
+        else: dates.append(("ENTREGADO", rnd.choice(["EFECTIVO", "QR"]), created, created + rnd.randint(300, 3600), i + 1))
+    with db.lock:
+        db.conn.executemany("UPDATE orders SET status=?, payment_method=?, date_created=?, date_paid=? WHERE id=?", dates)
+    db.flush()
+    return db
+
+def timed(fn, repeat, setup=None):
+    # setup (opcional) prepara cada repetición fuera del tiempo medido y lo que devuelve se le pasa a fn
+    times = []; result = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t = time.perf_counter(); result = fn(arg) if setup else fn(); times.append((time.perf_counter() - t) * 1000)
+    times.sort()
+    rows = len(result) if isinstance(result, (list, tuple, dict)) else result if isinstance(result, int) else None
+    return {"median_ms": round(statistics.median(times), 4), "min_ms": round(times[0], 4),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 4), "rows": rows}
+
+def cases(db, rnd):
+    # (nombre, función[, preparación]) de cada caso; las funciones devuelven filas o una cuenta.
+    # Las escrituras que borran o archivan van al final para no cambiar la base de las lecturas
+    ids = rnd.sample(range(1, db.conn.execute("SELECT max(id) FROM orders").fetchone()[0] + 1), 200)
+    pick = lambda: rnd.choice(ids)
+    this_year = str(datetime.now().year)  # El historial es relativo a hoy, el año del filtro también
+    year = report_ranges("Último Año", "Todos", "Todos", this_year)
+    month = report_ranges("Ninguno", "Todos", f"{datetime.now().month:02d}", this_year)
+    past = datetime(2000, 1, 1); past_ranges = [(past, past + timedelta(days=1))]  # Fuera del historial generado
+    service = OrderService(db)
+    board = [{"order_id": o.id, "customer_name": o.customer_name, "order_details": o.details, "total_price": o.price}
+             for o in db.get_active_orders()[1:]]
+
+    def write_cycle():
+        # add -> pagar -> borrar, con commit durable como en la caja
+        cart = random_cart(rnd); total, details = order_summary(cart, None, "Para Mesa")
+        oid = db.add_order("Bench", details, total, "Para Mesa", 0, cart)
+        db.mark_delivered(oid, "QR"); db.delete_order(oid); db.flush()
+        return 1
+
+    def new_order(status="ACTIVO", paid=None):
+        cart = random_cart(rnd); total, details = order_summary(cart, None, "Para Mesa")
+        oid = db.add_order("Bench", details, total, "Para Mesa", 0, cart)
+        if status == "FIADO": db.mark_delivered(oid, "FIADO")
+        if paid:
+            with db.lock: db.conn.execute("UPDATE orders SET status='ENTREGADO', payment_method='QR', date_paid=? WHERE id=?", (int(paid.timestamp()), oid))
+        return oid
+
+    def prepared(n, **kw):
+        oids = [new_order(**kw) for _ in range(n)]; db.flush(); return oids
+
+    def edit_args():
+        # Editar un pedido del tablero con un carrito nuevo, como al volver a guardarlo
+        cart = random_cart(rnd); total, details = order_summary(cart, None, "Para Mesa")
+        return (rnd.choice(board)["order_id"], "Bench", details, total, "Para Mesa", 0, cart)
+
+    def durable(fn):
+        # Escritura + commit durable, como en la caja
+        def run(arg): n = fn(arg); db.flush(); return n
+        return run
+
+    def paged(status):
+        rows = db.get_order_summaries(status, None, PAGE_SIZE); next_page_key(rows); return rows
+
+    yield "db.get_active_orders", db.get_active_orders
+    yield "db.get_order_by_id", lambda: [db.get_order_by_id(pick())]
+    yield "db.get_cart", lambda: db.get_cart(pick())
+    yield "db.get_order_details (cache)", lambda: db.get_order_details(pick())
+    yield "db.get_order_details (sin cache)", lambda: (db.details.clear(), db.get_order_details(pick()))[1]
+    yield "db.get_orders_by_status FIADO", lambda: db.get_orders_by_status("FIADO")
+    yield "db.get_order_summaries ENTREGADO p1", lambda: db.get_order_summaries("ENTREGADO", None, PAGE_SIZE)
+    yield "db.get_report_orders mes", lambda: db.get_report_orders(month)
+    yield "db.get_report_summaries año p1", lambda: db.get_report_summaries(year, None, PAGE_SIZE)
+    for f in QUICK_FILTERS:
+        r = report_ranges(f, "Todos", "Todos", this_year) if f != "Ninguno" else [(None, None)]
+        yield f"db.get_sales_summary {f}", lambda r=r: db.get_sales_summary(r)
+    yield "db.get_product_totals año", lambda: db.get_product_totals(year)
+    yield "db.search_report_summaries carmen", lambda: db.search_report_summaries("carmen", [(None, None)], 200)
+    yield "db.get_search_summary pollo pecho", lambda: db.get_search_summary("pollo pecho", [(None, None)])
+    yield "db.iter_report_rows año", lambda: sum(1 for _ in db.iter_report_rows(year))
+    yield "db.add/pay/delete", write_cycle
+    # Caminos de datos de las pantallas (lo que corre en el hilo de carga, sin widgets)
+    yield "home.refresh_home", lambda: (apply_board_diff(list(board), db.get_active_orders()), len(board))[1]
+    yield "order_list.load_data delivered", lambda: paged("ENTREGADO")
+    yield "order_list.load_data credit", lambda: paged("FIADO")
+    for f in QUICK_FILTERS:
+        yield f"report.run_filter {f}", lambda f=f: load_report(db, report_ranges(f, "Todos", "Todos", this_year))[0]
+    yield "report.run_filter búsqueda", lambda: load_report(db, [(None, None)], None, "doña carmen")[0]
+    yield "add_order.get_prices (todas)", lambda: [item_prices(*c) for c in itertools.product(FOODS, CUTS, VARIANTS, SODAS)]
+    yield "service.cart_lines (todas)", lambda: [service.cart_lines(*c) for c in itertools.product(FOODS, CUTS, VARIANTS, SODAS)]
+    yield "db.update_order", durable(lambda args: (db.update_order(*args), 1)[1]), edit_args
+    yield "db.pay_credit_order", durable(lambda oids: (db.pay_credit_order(oids[0], "QR"), 1)[1]), lambda: prepared(1, status="FIADO")
+    yield "db.delete_orders 50", durable(lambda oids: (db.delete_orders(oids), len(oids))[1]), lambda: prepared(50)
+    yield "db.delete_report_orders 50", durable(lambda oids: db.delete_report_orders(past_ranges)), lambda: prepared(50, paid=past)
+    yield "db.archive_batch 100", durable(lambda oids: db.archive_batch(to_ts(past_ranges[0][1]), 100)), lambda: prepared(100, paid=past)
+
+def meta():
+    try: rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except OSError: rev = ""
+    return {"git": rev, "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(), "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+def compare(results, baseline, threshold):
+    # Imprime el cociente nuevo/viejo por caso; devuelve cuántos empeoraron más que `threshold`
+    old = {(r["size"], r["case"]): r for r in baseline["results"]}; worse = 0
+    for r in results:
+        o = old.get((r["size"], r["case"]))
+        if not o or not o["median_ms"]: continue
+        ratio = r["median_ms"] / o["median_ms"]; flag = "  <-- MÁS LENTO" if ratio > threshold else ""
+        worse += bool(flag)
+        print(f"{r['size']:>7} {r['case']:<40}{o['median_ms']:>10.3f}{r['median_ms']:>10.3f}{ratio:>8.2f}x{flag}")
+    return worse
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de la capa de datos de Pollos RR-J")
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out", help="archivo JSON de resultados (por defecto a stdout)")
+    ap.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--threshold", type=float, default=1.25, help="cociente a partir del cual se marca una regresión")
+    args = ap.parse_args()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pollos_bench_") as tmp:
+        for n in [int(x) for x in args.sizes.split(",")]:
+            t = time.perf_counter()
+            db = generate(os.path.join(tmp, f"bench_{n}.db"), n)
+            print(f"# {n} pedidos generados en {time.perf_counter() - t:.1f} s", file=sys.stderr)
+            rnd = random.Random(n)
+            for name, fn, *setup in cases(db, rnd):
+                results.append({"size": n, "case": name, **timed(fn, args.repeat, *setup)})
+            db.close()
+    report = {"meta": meta(), "repeat": args.repeat, "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=1)
+    else: json.dump(report, sys.stdout, ensure_ascii=False, indent=1); print()
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)
+        sys.exit(1 if compare(results, baseline, args.threshold) else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+# Sincronización LAN con un servidor local de prueba: un servidor y dos clientes, cada uno con su
+# propia base temporal. Mide cuánto tarda un pedido (alta, edición, cobro) en verse en el otro dispositivo.
+# Uso: python bench_sync.py [--orders 50] [--write-behind]
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from database import Database
+from sync import SyncClient, SyncServer
+
+TOKEN = "bench"
+
+def wait_for(cond, timeout=5):
+    t = time.perf_counter()
+    while not cond():
+        if time.perf_counter() - t > timeout: return None
+        time.sleep(0.002)
+    return (time.perf_counter() - t) * 1000
+
+def main():
+    ap = argparse.ArgumentParser(description="Latencia de la sincronización LAN de Pollos RR-J")
+    ap.add_argument("--orders", type=int, default=50)
+    ap.add_argument("--write-behind", action="store_true", help="usar commit agrupado (POLLOS_WRITE_BEHIND)")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory(prefix="pollos_sync_") as tmp:
+        server_db, a, b = (Database(os.path.join(tmp, f"{n}.db"), write_behind=args.write_behind) for n in ("server", "a", "b"))
+        server = SyncServer(server_db, TOKEN, host="127.0.0.1", port=0).start()
+        clients = [SyncClient(db, server.url, TOKEN, wait=5).start() for db in (a, b)]
+        active = lambda db: {o.customer_name: o for o in db.get_active_orders()}
+        lat = {"alta A->B": [], "edición B->A": [], "cobro A->B": []}
+        for i in range(args.orders):
+            name = f"Mesa {i}"; cart = [{"qty": 1, "desc": "Pollo Pierna", "unit_price": 16, "price": 16}]
+            oid = a.add_order(name, "1x Pollo Pierna (16 Bs)\n(Para Mesa)", 16, "Para Mesa", 0, cart)
+            lat["alta A->B"].append(wait_for(lambda: name in active(b)))
+            b.update_order(active(b)[name].id, name + "+", "2x Pollo Pierna (32 Bs)\n(Para Mesa)", 32, "Para Mesa", 0, [dict(cart[0], qty=2, price=32)])
+            lat["edición B->A"].append(wait_for(lambda: name + "+" in active(a)))
+            a.mark_delivered(oid, "QR")
+            lat["cobro A->B"].append(wait_for(lambda: name + "+" not in active(b)))
+        for c in clients: c.stop()
+        server.stop()
+        for db in (server_db, a, b): db.close()
+    for k, v in lat.items():
+        ok = sorted(x for x in v if x is not None)
+        print(f"{k:<14} n={len(ok)}/{len(v)}  p50={statistics.median(ok):.0f} ms  p95={ok[int(len(ok) * 0.95) - 1]:.0f} ms  max={ok[-1]:.0f} ms")
+
+if __name__ == '__main__':
+    main()
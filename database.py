@@ -0,0 +1,879 @@
+import os
+import sqlite3
+import json
+import csv
+import functools
+import logging
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from datetime import datetime, timedelta
+
+# Capa de datos sin Kivy: la usan la app, los benchmarks y cualquier proceso sin pantalla.
+# Logger de Kivy es el logger "kivy" de logging: mismo destino sin importar Kivy acá
+Logger = logging.getLogger("kivy")
+
+# --- BASE DE DATOS ---
+DATE_FMT = "%Y-%m-%d %H:%M:%S"
+# Las fechas se guardan como segundos epoch (INTEGER); el día local se obtiene en SQL con:
+DAY_SQL = "date({}, 'unixepoch', 'localtime')"
+QUICK_FILTER_DAYS = {"Última Semana": 7, "Último Mes": 30, "Último Año": 365}
+# Totales, cantidad y reparto EFECTIVO/QR (mismas columnas que daily_sales)
+SUMMARY_SELECT = """SELECT {day} IFNULL(SUM(price), 0), COUNT(*),
+        IFNULL(SUM(CASE WHEN payment_method='EFECTIVO' THEN price END), 0), COUNT(CASE WHEN payment_method='EFECTIVO' THEN 1 END),
+        IFNULL(SUM(CASE WHEN payment_method='QR' THEN price END), 0), COUNT(CASE WHEN payment_method='QR' THEN 1 END)
+    FROM {table}"""
+
+# Registros compactos (namedtuple => __slots__) en lugar de tuplas con índices mágicos
+ORDER_COLS = "id, customer_name, details, price, status, payment_method, date_created, date_paid, delivery_type, moto_price, rev"
+Order = namedtuple("Order", ORDER_COLS.replace(",", ""))
+# Proyección para las listas: sin details ni carrito; date = fecha que se muestra en la fila
+OrderSummary = namedtuple("OrderSummary", "id customer_name price date")
+
+# Fila de orders_fts de cada pedido: nombre, details y descripciones del carrito
+FTS_ROWS = """INSERT INTO orders_fts (rowid, customer_name, details, items)
+    SELECT id, customer_name, details, (SELECT group_concat("desc", ' ') FROM order_items WHERE order_id = {table}.id)
+    FROM {table}"""
+# Reindexa un pedido (de orders u orders_archive); lo usan los triggers
+FTS_REFRESH = "DELETE FROM orders_fts WHERE rowid = {id}; " + FTS_ROWS + " WHERE id = {id};"
+
+# Sincronización LAN: columnas que viajan en el feed de cambios (sin id ni rev, que son locales)
+SYNC_COLS = ["customer_name", "details", "price", "status", "payment_method", "date_created", "date_paid", "delivery_type", "moto_price"]
+# Dispositivo que originó el cambio: el remoto mientras se aplica un lote (clave 'origin'), si no este
+SYNC_ORIGIN = "IFNULL((SELECT value FROM sync_meta WHERE key='origin'), (SELECT value FROM sync_meta WHERE key='device'))"
+
+# Columnas de la exportación (CSV / JSON Lines) en el orden de iter_report_rows()
+EXPORT_HEADER = ["id", "cliente", "detalle", "total", "pago", "pedido", "pagado", "entrega", "moto"]
+
+def summary_dict(sums):
+    keys = ["total", "orders", "cash_total", "cash_orders", "qr_total", "qr_orders"]
+    return {k: (round(v, 2) if k.endswith("total") else v) for k, v in zip(keys, sums)}
+
+def fts_query(text):
+    # Cada palabra como prefijo entre comillas ("carm"*): sin operadores FTS5 sueltos del usuario
+    words = [w.replace('"', '""') for w in text.split()]
+    return " ".join(f'"{w}"*' for w in words) or None
+
+def render_details(cart, moto, fallback):
+    # Markup del detalle: una línea por ítem del carrito (+ moto); sin carrito se muestra el texto guardado
+    if not cart: return fallback or ""
+    lines = [f"[b]{i['qty']}x[/b] {i['desc']} - {i['price']} Bs" for i in cart]
+    if moto and moto > 0: lines.append(f"Moto: {moto} Bs")
+    return "\n".join(lines)
+
+class DetailCache:
+    # LRU de markup ya renderizado: oid -> (rev, markup). Un rev distinto al guardado cuenta como fallo
+    def __init__(self, size=256):
+        self.size = size; self.items = OrderedDict(); self.lock = threading.Lock()
+
+    def get(self, oid, rev):
+        with self.lock:
+            hit = self.items.get(oid)
+            if hit is None or hit[0] != rev: return None
+            self.items.move_to_end(oid)
+            return hit[1]
+
+    def put(self, oid, rev, markup):
+        with self.lock:
+            self.items[oid] = (rev, markup); self.items.move_to_end(oid)
+            while len(self.items) > self.size: self.items.popitem(last=False)
+
+    def discard(self, oids):
+        with self.lock:
+            for oid in oids: self.items.pop(oid, None)
+
+    def clear(self):
+        with self.lock: self.items.clear()
+
+def legacy_cart(cart_json):
+    # Carrito viejo que quedó en cart_json (no se pudo pasar a order_items): se lee con claves tolerantes
+    try: items = json.loads(cart_json)
+    except ValueError: return []
+    if not isinstance(items, list): return []
+    cart = []
+    for i in items:
+        if not isinstance(i, dict): continue
+        qty = i.get("qty", i.get("cantidad", 1)); price = i.get("price", i.get("precio", 0))
+        cart.append({"qty": qty, "desc": i.get("desc", i.get("descripcion", "")), "unit_price": i.get("unit_price"), "price": price})
+    return cart
+
+def record_factory(record): return lambda cursor, row: record._make(row)
+
+def to_ts(d): return int(d.timestamp())
+
+def fmt_ts(ts):
+    # Capa de compatibilidad: las listas y diálogos siguen mostrando "AAAA-MM-DD HH:MM:SS"
+    return datetime.fromtimestamp(ts).strftime(DATE_FMT) if ts is not None else ""
+
+def report_ranges(sel_filter, sel_day, sel_month, sel_year, now=None):
+    # Traduce los filtros del buscador a rangos [inicio, fin) de date_paid (None = sin límite)
+    now = now or datetime.now()
+    if sel_filter == "Hoy":
+        start = datetime(now.year, now.month, now.day)
+        return [(start, start + timedelta(days=1))]
+    if sel_filter in QUICK_FILTER_DAYS:
+        return [(now - timedelta(days=QUICK_FILTER_DAYS[sel_filter]), None)]
+    if sel_filter != "Ninguno": return [(None, None)]
+    # Logica Manual: Año obligatorio, Mes y Día opcionales
+    year = int(sel_year)
+    months = range(1, 13) if sel_month == "Todos" else [int(sel_month)]
+    if sel_day == "Todos":
+        if sel_month == "Todos": return [(datetime(year, 1, 1), datetime(year + 1, 1, 1))]
+        m = months[0]
+        return [(datetime(year, m, 1), datetime(year + 1, 1, 1) if m == 12 else datetime(year, m + 1, 1))]
+    ranges = []
+    for m in months:
+        try: start = datetime(year, m, int(sel_day))
+        except ValueError: continue  # Ej: 31 de febrero
+        ranges.append((start, start + timedelta(days=1)))
+    return ranges
+
+def locked(fn):
+    # Serializa el acceso a la conexión escritora (hilo de la UI, hilo escritor y tareas de fondo)
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self.lock: return fn(self, *args, **kwargs)
+    return wrapper
+
+def reads(fn):
+    # Lecturas: solo toman el lock si usan la conexión escritora (hilo dueño)
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if threading.get_ident() != self._owner: return fn(self, *args, **kwargs)
+        with self.lock: return fn(self, *args, **kwargs)
+    return wrapper
+
+class Database:
+    # Modo write-behind: las sentencias se ejecutan al instante (la UI ve sus propios cambios)
+    # pero el COMMIT (fsync) lo hace un hilo escritor, agrupando lo escrito en la ventana
+    COMMIT_WINDOW = 0.25
+
+    def __init__(self, path="pollos_rrj_v18.db", write_behind=False):
+        # V18: Ajuste de menús anchos y pantalla completa
+        # Una sola conexión escritora (serializada con self.lock) + una conexión de lectura por hilo
+        self.details = DetailCache()
+        self.path = path
+        self.conn = self._connect()
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Solo tiene efecto en una base nueva
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.lock = threading.RLock()
+        self._owner = threading.get_ident()
+        self._local = threading.local()
+        self.write_behind = write_behind
+        self._dirty = threading.Event()
+        self._clean = threading.Event(); self._clean.set()  # Sin escrituras pendientes de commit
+        self.closed = False
+        self.create_table()
+        self.has_fts = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='orders_fts'").fetchone() is not None
+        self.archive_until = self.conn.execute("SELECT MAX(date_paid) FROM orders_archive").fetchone()[0]
+        self.device = self.sync_value("device")
+        if write_behind:
+            threading.Thread(target=self._writer_loop, name="db-writer", daemon=True).start()
+
+    def _connect(self, readonly=False):
+        if readonly: conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5)
+        else: conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        # WAL: los lectores no bloquean al escritor y cada commit es un solo fsync (append al WAL).
+        # Se mantiene FULL en la escritora para que un pago confirmado sobreviva a un corte de luz.
+        conn.execute(f"PRAGMA synchronous = {'NORMAL' if readonly else 'FULL'}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -8000")
+        return conn
+
+    def _conn(self):
+        # Hilo dueño (UI): conexión escritora, así ve sus propios cambios aún sin commit.
+        # Otros hilos (reportes, exportes, respaldos): su propia conexión de solo lectura.
+        if threading.get_ident() == self._owner: return self.conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None: conn = self._local.conn = self._connect(readonly=True)
+        return conn
+
+    def _writer_loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.COMMIT_WINDOW)  # Ventana de agrupación (group commit)
+            with self.lock:
+                if self.closed: return
+                self._dirty.clear()
+                if self.conn.in_transaction: self.conn.commit()
+                self._clean.set()
+
+    def _commit(self, durable=False):
+        # durable=True: barrera, el cambio queda en disco antes de volver (pagos)
+        if self.write_behind and not durable: self._clean.clear(); self._dirty.set()
+        else: self.conn.commit(); self._clean.set()
+
+    @locked
+    def flush(self):
+        if self.conn.in_transaction: self.conn.commit()
+        self._dirty.clear(); self._clean.set()
+
+    def wait_for_writes(self, timeout=None):
+        # Lectores de otros hilos solo ven lo confirmado: esperan al próximo group commit (sin forzarlo)
+        return self._clean.wait(timeout)
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.closed = True; self._dirty.set()  # Despierta al hilo escritor para que termine
+            self.conn.close()
+
+    def migrations(self):
+        return [self._migrate_order_items, self._migrate_epoch_dates, self.create_rollup, self._migrate_rev,
+                self._migrate_search, self._migrate_archive, self._migrate_sync]
+
+    @locked
+    def create_table(self):
+        # Arranque rápido: con el esquema al día basta leer user_version, sin re-ejecutar el DDL
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] == len(self.migrations()): return
+        # Esquema v0 (original); migrate() lo lleva a la versión actual
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_name TEXT,
+                details TEXT,
+                price REAL,
+                status TEXT, 
+                payment_method TEXT,
+                date_created TEXT, 
+                date_paid TEXT,
+                delivery_type TEXT,
+                moto_price REAL,
+                cart_json TEXT
+            )
+        """)
+        # Índice para los reportes: filtra por estado y rango de fecha de pago
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_paid ON orders(status, date_paid)")
+        self.conn.commit()
+        self.migrate()
+
+    def migrate(self):
+        # Migraciones versionadas con PRAGMA user_version; cada paso corre en su propia transacción
+        steps = self.migrations()
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for n, step in enumerate(steps[version:], version + 1):
+            self.conn.execute("BEGIN")
+            step()
+            self.conn.execute(f"PRAGMA user_version = {n}")
+            self.conn.commit()
+
+    def _migrate_order_items(self):
+        # v1: las líneas del carrito pasan de orders.cart_json a su propia tabla indexada
+        self.conn.execute("""
+            CREATE TABLE order_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                qty INTEGER,
+                "desc" TEXT,
+                unit_price NUMERIC,
+                price NUMERIC
+            )
+        """)
+        self.conn.execute("CREATE INDEX idx_order_items_order ON order_items(order_id)")
+        self.conn.execute('CREATE INDEX idx_order_items_desc ON order_items("desc")')
+        self.conn.execute("""
+            CREATE TRIGGER trg_order_items_del AFTER DELETE ON orders
+            BEGIN DELETE FROM order_items WHERE order_id = OLD.id; END
+        """)
+        # Backfill único desde los JSON existentes, con el lector tolerante (claves viejas o faltantes).
+        # Solo un cart_json que no es JSON se queda como está; se limpia el de los que se copiaron
+        done = []
+        for oid, cart_json in self.conn.execute("SELECT id, cart_json FROM orders WHERE cart_json IS NOT NULL").fetchall():
+            try: json.loads(cart_json)
+            except ValueError: continue
+            self._save_items(oid, legacy_cart(cart_json)); done.append((oid,))
+        self.conn.executemany("UPDATE orders SET cart_json=NULL WHERE id=?", done)
+
+    def _migrate_epoch_dates(self):
+        # v2: date_created/date_paid pasan de texto a INTEGER epoch; hay que reconstruir la tabla
+        # (una columna TEXT convertiría los enteros de vuelta a texto)
+        seq = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name='orders'").fetchone()
+        self.conn.execute("""
+            CREATE TABLE orders_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_name TEXT,
+                details TEXT,
+                price REAL,
+                status TEXT,
+                payment_method TEXT,
+                date_created INTEGER,
+                date_paid INTEGER,
+                delivery_type TEXT,
+                moto_price REAL,
+                cart_json TEXT
+            )
+        """)
+        # 'utc' interpreta el texto como hora local y lo pasa a epoch
+        self.conn.execute("""
+            INSERT INTO orders_new
+            SELECT id, customer_name, details, price, status, payment_method,
+                   CAST(strftime('%s', date_created, 'utc') AS INTEGER), CAST(strftime('%s', date_paid, 'utc') AS INTEGER),
+                   delivery_type, moto_price, cart_json
+            FROM orders
+        """)
+        self.conn.execute("DROP TABLE orders")
+        self.conn.execute("ALTER TABLE orders_new RENAME TO orders")
+        if seq: self.conn.execute("UPDATE sqlite_sequence SET seq=? WHERE name='orders'", seq)
+        self.conn.execute("CREATE INDEX idx_orders_status_paid ON orders(status, date_paid)")
+        self.conn.execute("CREATE INDEX idx_orders_status_created ON orders(status, date_created)")
+        self.conn.execute("""
+            CREATE TRIGGER trg_order_items_del AFTER DELETE ON orders
+            BEGIN DELETE FROM order_items WHERE order_id = OLD.id; END
+        """)
+        # Los triggers de daily_sales se fueron con la tabla vieja; create_rollup() los recrea
+
+    def _migrate_rev(self):
+        # v4: sello de modificación del contenido del pedido (clave de la caché de detalles)
+        self.conn.execute("ALTER TABLE orders ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_orders_rev AFTER UPDATE OF customer_name, details, price, moto_price ON orders
+            WHEN NEW.rev = OLD.rev
+            BEGIN
+                UPDATE orders SET rev = OLD.rev + 1 WHERE id = NEW.id;
+            END
+        """)
+
+    def _migrate_search(self):
+        # v5: índice de texto completo (sin acentos: "Dona" encuentra "Doña"). Si el SQLite no trae FTS5
+        # la búsqueda usa LIKE (ver _search_clause)
+        try:
+            self.conn.execute("""CREATE VIRTUAL TABLE orders_fts USING fts5(customer_name, details, items,
+                                 tokenize="unicode61 remove_diacritics 2")""")
+        except sqlite3.OperationalError as e:
+            Logger.warning(f"Pollos: FTS5 no disponible, búsqueda con LIKE ({e})"); return
+        for name, table, event, key in [("orders_fts_ins", "orders", "INSERT", "NEW.id"),
+                                        ("orders_fts_upd", "orders", "UPDATE OF customer_name, details", "NEW.id"),
+                                        ("order_items_fts_ins", "order_items", "INSERT", "NEW.order_id"),
+                                        ("order_items_fts_del", "order_items", "DELETE", "OLD.order_id")]:
+            self.conn.execute(f"CREATE TRIGGER trg_{name} AFTER {event} ON {table} BEGIN {FTS_REFRESH.format(id=key, table='orders')} END")
+        self.conn.execute("CREATE TRIGGER trg_orders_fts_del AFTER DELETE ON orders BEGIN DELETE FROM orders_fts WHERE rowid = OLD.id; END")
+        self.conn.execute(FTS_ROWS.format(table="orders"))
+
+    def _migrate_archive(self):
+        # v6: tabla fría para los ENTREGADO viejos (mismas columnas que orders). Al mover un pedido se
+        # inserta primero en el archivo y luego se borra de orders: sus ítems y su fila FTS se conservan
+        # y daily_sales queda igual (- en orders, + en el archivo)
+        self.conn.execute("""
+            CREATE TABLE orders_archive (
+                id INTEGER PRIMARY KEY,
+                customer_name TEXT,
+                details TEXT,
+                price REAL,
+                status TEXT,
+                payment_method TEXT,
+                date_created INTEGER,
+                date_paid INTEGER,
+                delivery_type TEXT,
+                moto_price REAL,
+                rev INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.conn.execute("CREATE INDEX idx_archive_status_paid ON orders_archive(status, date_paid)")
+        # Vista para los reportes cuyo rango llega a lo archivado
+        self.conn.execute(f"CREATE VIEW report_orders AS SELECT {ORDER_COLS} FROM orders UNION ALL SELECT {ORDER_COLS} FROM orders_archive")
+        self._rollup_triggers("orders_archive", "trg_archive_sales")
+        moved = "NOT EXISTS (SELECT 1 FROM orders_archive WHERE id = OLD.id)"
+        self.conn.execute("DROP TRIGGER trg_order_items_del")
+        self.conn.execute(f"""
+            CREATE TRIGGER trg_order_items_del AFTER DELETE ON orders WHEN {moved}
+            BEGIN DELETE FROM order_items WHERE order_id = OLD.id; END
+        """)
+        self.conn.execute("""
+            CREATE TRIGGER trg_archive_items_del AFTER DELETE ON orders_archive
+            BEGIN DELETE FROM order_items WHERE order_id = OLD.id; END
+        """)
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='orders_fts'").fetchone():
+            self.conn.execute("DROP TRIGGER trg_orders_fts_del")
+            self.conn.execute(f"CREATE TRIGGER trg_orders_fts_del AFTER DELETE ON orders WHEN {moved} BEGIN DELETE FROM orders_fts WHERE rowid = OLD.id; END")
+            self.conn.execute(f"CREATE TRIGGER trg_archive_fts_ins AFTER INSERT ON orders_archive BEGIN {FTS_REFRESH.format(id='NEW.id', table='orders_archive')} END")
+            self.conn.execute("CREATE TRIGGER trg_archive_fts_del AFTER DELETE ON orders_archive BEGIN DELETE FROM orders_fts WHERE rowid = OLD.id; END")
+
+    def _migrate_sync(self):
+        # v7: identidad global (uid = dispositivo:id local) y registro de cambios para la sincronización LAN.
+        # changes guarda solo la última secuencia de cada pedido (INSERT OR REPLACE): el feed manda el
+        # estado actual de los pedidos con seq > cursor, nunca copias de la base
+        self.conn.execute("CREATE TABLE sync_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("INSERT INTO sync_meta VALUES ('device', lower(hex(randomblob(4))))")
+        device = "(SELECT value FROM sync_meta WHERE key='device')"
+        for table in ("orders", "orders_archive"):
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN uid TEXT")
+            self.conn.execute(f"UPDATE {table} SET uid = {device} || ':' || id")
+            self.conn.execute(f"CREATE UNIQUE INDEX idx_{table}_uid ON {table}(uid)")
+        self.conn.execute("""
+            CREATE TABLE changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT NOT NULL UNIQUE,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                origin TEXT
+            )
+        """)
+        log = f"INSERT OR REPLACE INTO changes (uid, deleted, origin) VALUES ({{uid}}, {{deleted}}, {SYNC_ORIGIN});"
+        # Pedido nuevo local: el uid se pone después del INSERT (hace falta el id) y ese UPDATE queda registrado
+        self.conn.execute(f"CREATE TRIGGER trg_orders_uid AFTER INSERT ON orders WHEN NEW.uid IS NULL BEGIN UPDATE orders SET uid = {device} || ':' || NEW.id WHERE id = NEW.id; END")
+        self.conn.execute(f"CREATE TRIGGER trg_changes_ins AFTER INSERT ON orders WHEN NEW.uid IS NOT NULL BEGIN {log.format(uid='NEW.uid', deleted=0)} END")
+        self.conn.execute(f"CREATE TRIGGER trg_changes_upd AFTER UPDATE ON orders WHEN NEW.uid IS NOT NULL BEGIN {log.format(uid='NEW.uid', deleted=0)} END")
+        # Pasar un pedido al archivo no es un borrado
+        self.conn.execute(f"""CREATE TRIGGER trg_changes_del AFTER DELETE ON orders
+            WHEN OLD.uid IS NOT NULL AND NOT EXISTS (SELECT 1 FROM orders_archive WHERE id = OLD.id)
+            BEGIN {log.format(uid='OLD.uid', deleted=1)} END""")
+        self.conn.execute(f"CREATE TRIGGER trg_changes_archive_del AFTER DELETE ON orders_archive WHEN OLD.uid IS NOT NULL BEGIN {log.format(uid='OLD.uid', deleted=1)} END")
+        for event, row in [("INSERT", "NEW"), ("DELETE", "OLD")]:
+            self.conn.execute(f"""CREATE TRIGGER trg_changes_items_{event.lower()} AFTER {event} ON order_items BEGIN
+                INSERT OR REPLACE INTO changes (uid, deleted, origin)
+                SELECT uid, 0, {SYNC_ORIGIN} FROM orders WHERE id = {row}.order_id AND uid IS NOT NULL; END""")
+        # Lo que ya había en la base se publica una vez, para que los otros dispositivos lo reciban
+        self.conn.execute(f"INSERT INTO changes (uid, origin) SELECT uid, {device} FROM orders ORDER BY id")
+
+    def _source(self, ranges):
+        # Los reportes leen la vista con el archivo solo si algún rango empieza antes de lo archivado
+        if self.archive_until is None: return "orders"
+        if any(start is None or to_ts(start) <= self.archive_until for start, end in ranges): return "report_orders"
+        return "orders"
+
+    @locked
+    def archive_batch(self, cutoff, limit=500):
+        # Mueve hasta `limit` ENTREGADO pagados antes de `cutoff` (epoch) al archivo, en una transacción
+        ids = [r[0] for r in self.conn.execute(
+            "SELECT id FROM orders WHERE status='ENTREGADO' AND date_paid < ? AND cart_json IS NULL ORDER BY date_paid LIMIT ?",
+            (cutoff, limit))]  # Los que aún guardan su carrito en cart_json se quedan en orders (el archivo no lo tiene)
+        if not ids: return 0
+        marks = ",".join("?" * len(ids))
+        self.conn.execute(f"INSERT INTO orders_archive ({ORDER_COLS}, uid) SELECT {ORDER_COLS}, uid FROM orders WHERE id IN ({marks})", ids)
+        self.conn.execute(f"DELETE FROM orders WHERE id IN ({marks})", ids)
+        self.archive_until = self.conn.execute("SELECT MAX(date_paid) FROM orders_archive").fetchone()[0]
+        self._commit()
+        return len(ids)
+
+    @locked
+    def vacuum_step(self, pages=200):
+        # Devuelve al sistema hasta `pages` páginas libres; True si quedan más
+        self.conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+        self._commit()
+        return self.conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+
+    def archive_old(self, days, pause=0.05):
+        # Tarea de fondo: archiva por lotes y compacta de a poco, soltando el lock entre pasos
+        # para que la caja siga escribiendo sin esperar
+        cutoff = int(time.time()) - days * 86400; moved = 0
+        while True:
+            n = self.archive_batch(cutoff); moved += n
+            if not n: break
+            time.sleep(pause)
+        # Solo se compacta de a poco con auto_vacuum INCREMENTAL; las bases creadas antes se convierten
+        # con compact(), a mano (un VACUUM completo acá congelaría la caja)
+        if self._conn().execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            while self.vacuum_step(): time.sleep(pause)
+        elif moved: Logger.info("Pollos: base sin auto_vacuum incremental; el espacio se libera con Compactar base")
+        if moved: Logger.info(f"Pollos: {moved} pedidos archivados (pagados hace más de {days} días)")
+        return moved
+
+    @locked
+    def compact(self):
+        # Mantenimiento explícito: VACUUM completo con el lock tomado (la caja espera mientras se reescribe
+        # el archivo). Deja la base en auto_vacuum INCREMENTAL; devuelve los bytes liberados
+        self.flush(); before = os.path.getsize(self.path)
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL"); self.conn.execute("VACUUM")
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return before - os.path.getsize(self.path)
+
+    def _prerender(self, order_id, moto, details, cart_data):
+        # Se renderiza al escribir: abrir el detalle después es solo una búsqueda en la caché
+        rev = self.conn.execute("SELECT rev FROM orders WHERE id=?", (order_id,)).fetchone()[0]
+        self.details.put(order_id, rev, render_details(cart_data, moto, details))
+
+    def _save_items(self, order_id, cart_data):
+        self.conn.execute("DELETE FROM order_items WHERE order_id=?", (order_id,))
+        self.conn.executemany('INSERT INTO order_items (order_id, qty, "desc", unit_price, price) VALUES (?, ?, ?, ?, ?)',
+                                [(order_id, i['qty'], i['desc'], i.get('unit_price'), i['price']) for i in cart_data])
+
+    def create_rollup(self):
+        # v3: resumen de ventas por día (solo ENTREGADO), mantenido por triggers en cada escritura
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_sales'").fetchone() is not None
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_sales (
+                day TEXT PRIMARY KEY,
+                total REAL NOT NULL DEFAULT 0,
+                orders INTEGER NOT NULL DEFAULT 0,
+                cash_total REAL NOT NULL DEFAULT 0,
+                cash_orders INTEGER NOT NULL DEFAULT 0,
+                qr_total REAL NOT NULL DEFAULT 0,
+                qr_orders INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._rollup_triggers("orders", "trg_daily_sales")
+        if not exists:
+            # Primera vez: llenamos el resumen con el historial existente
+            day = DAY_SQL.format("date_paid")
+            self.conn.execute(f"INSERT INTO daily_sales {SUMMARY_SELECT.format(day=day + ',', table='orders')} "
+                                f"WHERE status='ENTREGADO' AND date_paid IS NOT NULL GROUP BY {day}")
+
+    def _rollup_triggers(self, table, prefix):
+        for name, event, row, sign in [("ins", "INSERT", "NEW", "+"), ("del", "DELETE", "OLD", "-"),
+                                       ("upd_old", "UPDATE OF status, price, payment_method, date_paid", "OLD", "-"),
+                                       ("upd_new", "UPDATE OF status, price, payment_method, date_paid", "NEW", "+")]:
+            self.conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {prefix}_{name} AFTER {event} ON {table}
+                WHEN {row}.status='ENTREGADO' AND {row}.date_paid IS NOT NULL
+                BEGIN
+                    INSERT OR IGNORE INTO daily_sales (day) VALUES ({DAY_SQL.format(row + '.date_paid')});
+                    UPDATE daily_sales SET
+                        total = total {sign} IFNULL({row}.price, 0),
+                        orders = orders {sign} 1,
+                        cash_total = cash_total {sign} (CASE WHEN {row}.payment_method='EFECTIVO' THEN IFNULL({row}.price, 0) ELSE 0 END),
+                        cash_orders = cash_orders {sign} ({row}.payment_method='EFECTIVO'),
+                        qr_total = qr_total {sign} (CASE WHEN {row}.payment_method='QR' THEN IFNULL({row}.price, 0) ELSE 0 END),
+                        qr_orders = qr_orders {sign} ({row}.payment_method='QR')
+                    WHERE day = {DAY_SQL.format(row + '.date_paid')};
+                    DELETE FROM daily_sales WHERE day = {DAY_SQL.format(row + '.date_paid')} AND orders <= 0;
+                END
+            """)
+
+    @locked
+    def add_order(self, name, details, price, delivery, moto, cart_data):
+        date_now = int(time.time())
+        cur = self.conn.execute("""
+            INSERT INTO orders (customer_name, details, price, status, payment_method, date_created, 
+                                delivery_type, moto_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (name, details, price, "ACTIVO", "PENDIENTE", date_now, delivery, moto))
+        self._save_items(cur.lastrowid, cart_data)
+        self._prerender(cur.lastrowid, moto, details, cart_data)
+        self._commit()
+        return cur.lastrowid
+
+    @locked
+    def update_order(self, order_id, name, details, price, delivery, moto, cart_data):
+        self.conn.execute("""
+            UPDATE orders SET 
+                customer_name=?, details=?, price=?, delivery_type=?, moto_price=?, cart_json=NULL
+            WHERE id=?
+        """, (name, details, price, delivery, moto, order_id))
+        self._save_items(order_id, cart_data)
+        self._prerender(order_id, moto, details, cart_data)
+        self._commit()
+
+    @locked
+    def delete_order(self, order_id):
+        for table in ("orders", "orders_archive"): self.conn.execute(f"DELETE FROM {table} WHERE id=?", (order_id,))
+        self.details.discard([order_id])
+        self._commit()
+        
+    @locked
+    def delete_orders(self, order_ids):
+        # Un solo DELETE ... IN por lote y un solo commit para toda la selección
+        ids = list(order_ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for table in ("orders", "orders_archive"):
+                self.conn.execute(f"DELETE FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        self.details.discard(ids)
+        self._commit()
+
+    @locked
+    def delete_report_orders(self, ranges, query=""):
+        # Borra todo lo que coincide con el filtro (y la búsqueda) del reporte, directo en SQL
+        where, params = self._report_where(ranges, query)
+        n = sum(self.conn.execute(f"DELETE FROM {table} WHERE {where}", params).rowcount for table in ("orders", "orders_archive"))
+        self.details.clear()
+        self._commit()
+        return n
+
+    @locked
+    def clear_all_delivered(self):
+        for table in ("orders", "orders_archive"): self.conn.execute(f"DELETE FROM {table} WHERE status='ENTREGADO'")
+        self.details.clear()
+        self._commit()
+
+    def _fetch(self, record, sql, params=()):
+        cur = self._conn().cursor()
+        cur.row_factory = record_factory(record)
+        return cur.execute(sql, params).fetchall()
+
+    @reads
+    def get_order_by_id(self, oid):
+        rows = self._fetch(Order, f"SELECT {ORDER_COLS} FROM orders WHERE id=?", (oid,))
+        if not rows and self.archive_until is not None:
+            rows = self._fetch(Order, f"SELECT {ORDER_COLS} FROM orders_archive WHERE id=?", (oid,))
+        return rows[0] if rows else None
+
+    @reads
+    def get_cart(self, order_id):
+        conn = self._conn()
+        rows = conn.execute('SELECT qty, "desc", unit_price, price FROM order_items WHERE order_id=? ORDER BY id', (order_id,)).fetchall()
+        if rows: return [{"qty": q, "desc": d, "unit_price": u, "price": p} for q, d, u, p in rows]
+        row = conn.execute("SELECT cart_json FROM orders WHERE id=?", (order_id,)).fetchone()
+        return legacy_cart(row[0]) if row and row[0] else []
+
+    @reads
+    def get_order_details(self, oid):
+        # (pedido, markup del detalle); el markup sale de la caché LRU si el rev coincide
+        order = self.get_order_by_id(oid)
+        if not order: return None, ""
+        markup = self.details.get(oid, order.rev)
+        if markup is None:
+            markup = render_details(self.get_cart(oid), order.moto_price, order.details)
+            self.details.put(oid, order.rev, markup)
+        return order, markup
+
+    @reads
+    def get_product_totals(self, ranges):
+        # Ventas por producto del filtro, sin deserializar ningún carrito
+        where, params = self._range_clause(ranges, alias="o.")
+        return self._conn().execute(f"""
+            SELECT i."desc", SUM(i.qty), SUM(i.price) FROM {self._source(ranges)} o JOIN order_items i ON i.order_id = o.id
+            WHERE {where}
+            GROUP BY i."desc" ORDER BY SUM(i.price) DESC""", params).fetchall()
+
+    @reads
+    def get_active_orders(self):
+        return self._fetch(Order, f"SELECT {ORDER_COLS} FROM orders WHERE status='ACTIVO' ORDER BY id")
+
+    @reads
+    def get_orders_by_status(self, status):
+        return self._fetch(Order, f"SELECT {ORDER_COLS} FROM orders WHERE status=? ORDER BY date_created DESC", (status,))
+
+    def _page(self, sql, params, key, after, limit):
+        # Paginación keyset: (key, id) < último visto, más recientes primero; usa el índice (status, key)
+        if after: sql += f" AND ({key}, id) < (?, ?)"; params = params + list(after)
+        sql += f" ORDER BY {key} DESC, id DESC"
+        if limit: sql += " LIMIT ?"; params = params + [limit]
+        return sql, params
+
+    @reads
+    def get_order_summaries(self, status, after=None, limit=None):
+        # Entregados se ordenan y muestran por fecha de pago (incluye lo archivado); fiados por la del pedido
+        key = "date_paid" if status == "ENTREGADO" else "date_created"
+        table = "report_orders" if status == "ENTREGADO" and self.archive_until is not None else "orders"
+        return self._fetch(OrderSummary, *self._page(f"SELECT id, customer_name, price, {key} FROM {table} WHERE status=?", [status], key, after, limit))
+
+    def _range_clause(self, ranges, status="ENTREGADO", alias=""):
+        # Cada rango [inicio, fin) se vuelve un termino indexable sobre (status, date_paid)
+        terms = []; params = []
+        for start, end in ranges:
+            t = f"{alias}status=? AND {alias}date_paid IS NOT NULL"; params.append(status)
+            if start: t += f" AND {alias}date_paid>=?"; params.append(to_ts(start))
+            if end: t += f" AND {alias}date_paid<?"; params.append(to_ts(end))
+            terms.append(f"({t})")
+        return (" OR ".join(terms) or "0"), params
+
+    def _search_clause(self, query, alias=""):
+        # Pedidos que coinciden con la búsqueda: FTS5 si está, si no LIKE por palabra
+        if self.has_fts: return f"{alias}id IN (SELECT rowid FROM orders_fts WHERE orders_fts MATCH ?)", [fts_query(query)]
+        terms = []; params = []
+        for w in query.split():
+            terms.append(f"""({alias}customer_name LIKE ? OR {alias}details LIKE ?
+                              OR {alias}id IN (SELECT order_id FROM order_items WHERE "desc" LIKE ?))""")
+            params += [f"%{w}%"] * 3
+        return " AND ".join(terms), params
+
+    def _report_where(self, ranges, query=""):
+        where, params = self._range_clause(ranges)
+        if not fts_query(query): return where, params
+        search, sp = self._search_clause(query)
+        return f"({where}) AND {search}", params + sp
+
+    @reads
+    def search_report_summaries(self, query, ranges, limit):
+        # Coincidencias del filtro ordenadas por relevancia (bm25: el nombre pesa más que el contenido)
+        where, params = self._range_clause(ranges, alias="o.")
+        if not self.has_fts:
+            search, sp = self._search_clause(query, alias="o.")
+            return self._fetch(OrderSummary, f"""SELECT o.id, o.customer_name, o.price, o.date_paid FROM {self._source(ranges)} o
+                WHERE ({where}) AND {search} ORDER BY o.date_paid DESC, o.id DESC LIMIT ?""", params + sp + [limit])
+        return self._fetch(OrderSummary, f"""
+            SELECT o.id, o.customer_name, o.price, o.date_paid
+            FROM (SELECT rowid, bm25(orders_fts, 10.0, 2.0, 2.0) AS score FROM orders_fts WHERE orders_fts MATCH ?) f
+            JOIN {self._source(ranges)} o ON o.id = f.rowid
+            WHERE {where}
+            ORDER BY f.score, o.date_paid DESC LIMIT ?""", [fts_query(query)] + params + [limit])
+
+    def iter_report_rows(self, ranges, query="", chunk=500):
+        # Generador para exportar: recorre el filtro con fetchmany, sin cargar todo en memoria.
+        # Se usa desde el hilo de exportación (conexión de solo lectura propia, sin tomar el lock)
+        where, params = self._report_where(ranges, query)
+        cur = self._conn().execute(f"""
+            SELECT id, customer_name, details, price, payment_method, date_created, date_paid, delivery_type, moto_price
+            FROM {self._source(ranges)} WHERE {where} ORDER BY date_paid, id""", params)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows: return
+            yield from rows
+
+    @reads
+    def get_search_summary(self, query, ranges):
+        # Totales de todas las coincidencias (no solo las mostradas)
+        where, params = self._report_where(ranges, query)
+        sql = f"{SUMMARY_SELECT.format(day='', table=self._source(ranges))} WHERE {where}"
+        return summary_dict(self._conn().execute(sql, params).fetchone())
+
+    @reads
+    def get_report_orders(self, ranges):
+        where, params = self._range_clause(ranges)
+        return self._fetch(Order, f"SELECT {ORDER_COLS} FROM {self._source(ranges)} WHERE {where} ORDER BY date_paid DESC", params)
+
+    @reads
+    def get_report_summaries(self, ranges, after=None, limit=None):
+        where, params = self._range_clause(ranges)
+        return self._fetch(OrderSummary, *self._page(f"SELECT id, customer_name, price, date_paid FROM {self._source(ranges)} WHERE ({where})",
+                                                     params, "date_paid", after, limit))
+
+    @reads
+    def get_sales_summary(self, ranges):
+        # Totales del filtro: días completos salen de daily_sales, los bordes parciales de orders
+        conn = self._conn(); sums = [0] * 6; edges = []
+        for start, end in ranges:
+            first = start and datetime(start.year, start.month, start.day)
+            if first and first != start: first += timedelta(days=1)
+            last = end and datetime(end.year, end.month, end.day)
+            if first and last and first >= last:
+                edges.append((start, end)); continue
+            if start and start != first: edges.append((start, first))
+            if end and end != last: edges.append((last, end))
+            t = "1"; params = []
+            if first: t += " AND day>=?"; params.append(first.strftime("%Y-%m-%d"))
+            if last: t += " AND day<?"; params.append(last.strftime("%Y-%m-%d"))
+            row = conn.execute(f"""
+                SELECT IFNULL(SUM(total), 0), IFNULL(SUM(orders), 0), IFNULL(SUM(cash_total), 0),
+                       IFNULL(SUM(cash_orders), 0), IFNULL(SUM(qr_total), 0), IFNULL(SUM(qr_orders), 0)
+                FROM daily_sales WHERE {t}""", params).fetchone()
+            sums = [a + b for a, b in zip(sums, row)]
+        if edges:
+            where, params = self._range_clause(edges)
+            row = conn.execute(f"{SUMMARY_SELECT.format(day='', table=self._source(edges))} WHERE {where}", params).fetchone()
+            sums = [a + b for a, b in zip(sums, row)]
+        return summary_dict(sums)
+
+    @locked
+    def mark_delivered(self, order_id, payment_method):
+        status = "ENTREGADO"
+        date_p = int(time.time())
+        if payment_method == "FIADO":
+            status = "FIADO"
+            date_p = None 
+        self.conn.execute("""
+            UPDATE orders SET status=?, payment_method=?, date_paid=? WHERE id=?
+        """, (status, payment_method, date_p, order_id))
+        self._commit(durable=True)
+
+    @locked
+    def pay_credit_order(self, order_id, payment_method):
+        date_p = int(time.time())
+        self.conn.execute("""
+            UPDATE orders SET status='ENTREGADO', payment_method=?, date_paid=? WHERE id=?
+        """, (payment_method, date_p, order_id))
+        self._commit(durable=True)
+
+    # Sincronización LAN (ver sync.py)
+    @reads
+    def sync_value(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM sync_meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @locked
+    def set_sync_value(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO sync_meta VALUES (?, ?)", (key, str(value)))
+        self._commit()
+
+    @reads
+    def changes_since(self, seq, origin=None, exclude=None, limit=500):
+        # (última seq revisada, cambios) con seq > `seq`; origin/exclude filtran por dispositivo de origen.
+        # La seq devuelta avanza aunque todo lo revisado se haya filtrado
+        conn = self._conn()
+        rows = conn.execute(f"""
+            SELECT c.seq, c.uid, c.deleted, c.origin, {', '.join('o.' + c for c in SYNC_COLS)}, o.id
+            FROM changes c LEFT JOIN orders o ON o.uid = c.uid WHERE c.seq > ? ORDER BY c.seq LIMIT ?""", (seq, limit)).fetchall()
+        if not rows: return seq, []
+        out = []
+        for r in rows:
+            if (origin and r[3] != origin) or (exclude and r[3] == exclude): continue
+            if not r[2] and r[-1] is None: continue  # Pasó al archivo: los otros archivan con la misma regla
+            change = {"seq": r[0], "uid": r[1], "origin": r[3], "deleted": bool(r[2])}
+            if not change["deleted"]:
+                change["order"] = dict(zip(SYNC_COLS, r[4:-1]))
+                change["items"] = [[i["qty"], i["desc"], i["unit_price"], i["price"]] for i in self.get_cart(r[-1])]
+            out.append(change)
+        return rows[-1][0], out
+
+    @reads
+    def last_change(self):
+        return self._conn().execute("SELECT IFNULL(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    @locked
+    def apply_changes(self, changes, cursor=None):
+        # Aplica cambios remotos (último en llegar gana). Quedan en el registro local con su origen,
+        # así un servidor los reenvía a los demás y el cliente no los devuelve.
+        # cursor: (clave, seq) que se guarda en la misma transacción que los cambios
+        cols = ", ".join(SYNC_COLS); marks = ", ".join("?" * len(SYNC_COLS))
+        touched = []
+        self.flush()  # Lo local pendiente se confirma aparte: un lote remoto con error se descarta entero
+        try: self._apply(changes, cols, marks, touched, cursor)
+        except Exception:
+            self.conn.rollback(); raise
+        self.details.discard(touched)
+        self._commit(durable=True)
+        return len(touched)
+
+    def _apply(self, changes, cols, marks, touched, cursor):
+        for c in changes:
+            self.conn.execute("INSERT OR REPLACE INTO sync_meta VALUES ('origin', ?)", (c["origin"],))
+            row = self.conn.execute("SELECT id FROM orders WHERE uid=?", (c["uid"],)).fetchone()
+            if c["deleted"]:
+                for table in ("orders", "orders_archive"): self.conn.execute(f"DELETE FROM {table} WHERE uid=?", (c["uid"],))
+                if row: touched.append(row[0])
+                continue
+            values = [c["order"][k] for k in SYNC_COLS]
+            if row:
+                oid = row[0]
+                self.conn.execute(f"UPDATE orders SET ({cols}) = ({marks}) WHERE id=?", values + [oid])
+            elif self.conn.execute("SELECT 1 FROM orders_archive WHERE uid=?", (c["uid"],)).fetchone():
+                continue  # Ya archivado acá: historial viejo, no se revive
+            else:
+                oid = self.conn.execute(f"INSERT INTO orders ({cols}, uid) VALUES ({marks}, ?)", values + [c["uid"]]).lastrowid
+            self._save_items(oid, [dict(zip(("qty", "desc", "unit_price", "price"), i)) for i in c["items"]])
+            touched.append(oid)
+        self.conn.execute("DELETE FROM sync_meta WHERE key='origin'")
+        if cursor: self.conn.execute("INSERT OR REPLACE INTO sync_meta VALUES (?, ?)", (cursor[0], str(cursor[1])))
+
+# --- DATOS DE LAS PANTALLAS ---
+PAGE_SIZE = 50
+SEARCH_LIMIT = 200  # Con búsqueda se muestran las coincidencias más relevantes, sin paginar
+
+def next_page_key(rows):
+    # Cursor keyset para pedir la página siguiente (None = no hay más)
+    return (rows[-1].date, rows[-1].id) if len(rows) == PAGE_SIZE else None
+
+def load_report(db, ranges, after=None, query=""):
+    if fts_query(query): return db.search_report_summaries(query, ranges, SEARCH_LIMIT), db.get_search_summary(query, ranges)
+    # El resumen (totales) solo hace falta con la primera página
+    rows = db.get_report_summaries(ranges, after, PAGE_SIZE)
+    return rows, (None if after else db.get_sales_summary(ranges))
+
+def export_report(db, ranges, query, fmt, path):
+    # Escribe fila por fila a un .tmp y renombra al final: un error a mitad no deja un archivo cortado
+    tmp = path + ".tmp"; n = 0
+    try:
+        with open(tmp, "w", newline="", encoding="utf-8-sig" if fmt == "csv" else "utf-8") as f:
+            if fmt == "csv": w = csv.writer(f); w.writerow(EXPORT_HEADER)
+            for row in db.iter_report_rows(ranges, query):
+                row = list(row); row[5] = fmt_ts(row[5]); row[6] = fmt_ts(row[6])
+                if fmt == "csv": w.writerow(row)
+                else: f.write(json.dumps(dict(zip(EXPORT_HEADER, row)), ensure_ascii=False) + "\n")
+                n += 1
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+    return path, n
+
+def apply_board_diff(data, orders):
+    # Tablero incremental: solo se tocan las tarjetas que se agregaron, cambiaron o se fueron.
+    # data es el rv.data del RecycleView (o cualquier lista de dicts de tarjeta)
+    fresh = {o.id: {"order_id": o.id, "customer_name": o.customer_name, "order_details": o.details,
+                    "total_price": o.price} for o in orders}
+    index = {d["order_id"]: i for i, d in enumerate(data)}
+    for oid in sorted((oid for oid in index if oid not in fresh), key=index.get, reverse=True):
+        del data[index[oid]]
+    index = {d["order_id"]: i for i, d in enumerate(data)}
+    for oid, card in fresh.items():
+        if oid not in index: data.append(card)
+        elif data[index[oid]] != card: data[index[oid]] = card
@@ -1,113 +1,82 @@
-import sqlite3
-import json
-from datetime import datetime, timedelta
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from kivymd.app import MDApp
 from kivy.lang import Builder
+from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.uix.screenmanager import Screen, ScreenManager
 from kivymd.uix.card import MDCard
 from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDFlatButton, MDRaisedButton, MDIconButton
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.list import TwoLineAvatarIconListItem, IconLeftWidget, OneLineAvatarIconListItem, IconRightWidget
-from kivy.properties import StringProperty, NumericProperty, ObjectProperty, ListProperty
+from kivymd.uix.list import TwoLineAvatarIconListItem, OneLineAvatarIconListItem, IconRightWidget
+from kivy.properties import StringProperty, NumericProperty, ObjectProperty, ListProperty, BooleanProperty
 from kivy.core.window import Window
+from database import Database, apply_board_diff, fmt_ts, fts_query, next_page_key
+from profiling import Profiler, instrument, profiled
+from service import OrderService
+from sync import PORT, SyncClient, SyncServer
 
 # --- AJUSTE DE PANTALLA V18 ---
 # Eliminamos la restricción de tamaño para que se adapte al celular
 # Window.size = (360, 640) 
 
-# --- BASE DE DATOS ---
-class Database:
-    def __init__(self):
-        # V18: Ajuste de menús anchos y pantalla completa
-        self.conn = sqlite3.connect("pollos_rrj_v18.db", check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.create_table()
-
-    def create_table(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_name TEXT,
-                details TEXT,
-                price REAL,
-                status TEXT, 
-                payment_method TEXT,
-                date_created TEXT, 
-                date_paid TEXT,
-                delivery_type TEXT,
-                moto_price REAL,
-                cart_json TEXT
-            )
-        """)
-        self.conn.commit()
-
-    def add_order(self, name, details, price, delivery, moto, cart_data):
-        date_now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cart_str = json.dumps(cart_data) 
-        self.cursor.execute("""
-            INSERT INTO orders (customer_name, details, price, status, payment_method, date_created, 
-                                delivery_type, moto_price, cart_json)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (name, details, price, "ACTIVO", "PENDIENTE", date_now, delivery, moto, cart_str))
-        self.conn.commit()
-
-    def update_order(self, order_id, name, details, price, delivery, moto, cart_data):
-        cart_str = json.dumps(cart_data)
-        self.cursor.execute("""
-            UPDATE orders SET 
-                customer_name=?, details=?, price=?, delivery_type=?, moto_price=?, cart_json=?
-            WHERE id=?
-        """, (name, details, price, delivery, moto, cart_str, order_id))
-        self.conn.commit()
-
-    def delete_order(self, order_id):
-        self.cursor.execute("DELETE FROM orders WHERE id=?", (order_id,))
-        self.conn.commit()
-        
-    def clear_all_delivered(self):
-        self.cursor.execute("DELETE FROM orders WHERE status='ENTREGADO'")
-        self.conn.commit()
-
-    def get_order_by_id(self, oid):
-        self.cursor.execute("SELECT * FROM orders WHERE id=?", (oid,))
-        return self.cursor.fetchone()
-
-    def get_active_orders(self):
-        self.cursor.execute("SELECT * FROM orders WHERE status='ACTIVO'")
-        return self.cursor.fetchall()
-
-    def get_orders_by_status(self, status):
-        self.cursor.execute("SELECT * FROM orders WHERE status=? ORDER BY date_created DESC", (status,))
-        return self.cursor.fetchall()
-
-    def get_report_data(self):
-        self.cursor.execute("SELECT * FROM orders WHERE status='ENTREGADO' ORDER BY date_paid DESC")
-        return self.cursor.fetchall()
-
-    def mark_delivered(self, order_id, payment_method):
-        status = "ENTREGADO"
-        date_p = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        if payment_method == "FIADO":
-            status = "FIADO"
-            date_p = None 
-        self.cursor.execute("""
-            UPDATE orders SET status=?, payment_method=?, date_paid=? WHERE id=?
-        """, (status, payment_method, date_p, order_id))
-        self.conn.commit()
-
-    def pay_credit_order(self, order_id, payment_method):
-        date_p = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.cursor.execute("""
-            UPDATE orders SET status='ENTREGADO', payment_method=?, date_paid=? WHERE id=?
-        """, (payment_method, date_p, order_id))
-        self.conn.commit()
-
-db = Database()
+# POLLOS_PROFILE=1 registra tiempos de la BD y de las pantallas en pollos_profile.log (percentiles cada minuto)
+profiler = Profiler() if os.environ.get("POLLOS_PROFILE") == "1" else None
+if profiler: instrument(Database, profiler, skip=("migrations",))
+
+# POLLOS_WRITE_BEHIND=1 activa el commit agrupado en segundo plano
+db = Database(write_behind=os.environ.get("POLLOS_WRITE_BEHIND") == "1")
+# Reglas del negocio (precios, carrito, filtros, cobros): las pantallas solo leen widgets y llaman a service
+service = OrderService(db)
+
+# --- CARGA EN SEGUNDO PLANO ---
+class DataLoader:
+    # Corre las consultas de las pantallas en hilos de fondo y entrega el resultado con Clock.
+    # Cada pantalla usa su propia clave: un pedido nuevo cancela/descarta el anterior.
+    # Si la consulta falla se llama a on_error(excepción), para que la pantalla salga de "Cargando...".
+    def __init__(self, db):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="loader")
+        self.tokens = {}; self.futures = {}
+
+    def submit(self, key, callback, fn, *args, on_error=None):
+        token = self.tokens[key] = self.tokens.get(key, 0) + 1
+        old = self.futures.get(key)
+        if old: old.cancel()
+        fut = self.futures[key] = self.executor.submit(self._run, fn, args); start = time.perf_counter()
+        fut.add_done_callback(lambda f: Clock.schedule_once(lambda dt: self._deliver(key, token, f, callback, start, on_error)))
+
+    def _run(self, fn, args):
+        self.db.wait_for_writes(Database.COMMIT_WINDOW * 4)
+        return fn(*args)
+
+    def _deliver(self, key, token, fut, callback, start, on_error):
+        if fut.cancelled() or self.tokens.get(key) != token: return  # Resultado viejo
+        self.futures.pop(key, None)
+        if profiler: profiler.record(f"loader.{key}", (time.perf_counter() - start) * 1000)  # Pedido -> entrega en la UI
+        try: result = fut.result()
+        except Exception as e:
+            Logger.exception(f"Pollos: error cargando {key}: {e}")
+            if on_error: on_error(e)
+            return
+        callback(result)
+
+loader = DataLoader(db)
 
 # --- INTERFAZ (KV) ---
-KV = '''
+# Reglas de las pantallas de historial/reportes: con POLLOS_LAZY_SCREENS=1 se compilan recién al entrar
+KV_HISTORY = '''
+<OrderRow>:
+    IconLeftWidget:
+        icon: root.icon
+        theme_text_color: "Custom"
+        text_color: root.icon_color
+
 <DeleteDialogContent>:
     orientation: "vertical"
     size_hint_y: None
@@ -153,6 +122,7 @@ KV = '''
             title: "Gestión y Reportes"
             md_bg_color: 1, 0.5, 0, 1
             left_action_items: [["arrow-left", lambda x: app.go_home()]]
+            right_action_items: [["database-cog", lambda x: app.confirm_compact()]]
         MDBoxLayout:
             orientation: "vertical"
             padding: "20dp"
@@ -197,9 +167,16 @@ KV = '''
             left_action_items: [["arrow-left", lambda x: app.go_to_history_menu()]]
             right_action_items: []
 
-        MDScrollView:
-            MDList:
-                id: the_list
+        RecycleView:
+            id: the_list
+            viewclass: "OrderRow"
+            on_scroll_y: root.on_list_scroll(self)
+            RecycleBoxLayout:
+                orientation: "vertical"
+                default_size: None, dp(72)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
 
     MDFloatingActionButton:
         id: fab_delete
@@ -259,6 +236,15 @@ KV = '''
                     size_hint_x: 0.3
                     on_release: root.open_menu('year')
 
+            MDTextField:
+                id: search_field
+                hint_text: "Cliente o producto (ej. Doña Carmen)"
+                mode: "rectangle"
+                size_hint_x: 1
+                text_color_normal: 0, 0, 0, 1
+                text_color_focus: 0, 0, 0, 1
+                on_text_validate: root.generate_report()
+
             MDRaisedButton:
                 text: "BUSCAR / CALCULAR"
                 size_hint_x: 1
@@ -266,8 +252,9 @@ KV = '''
                 on_release: root.generate_report()
             
             MDCard:
+                orientation: "vertical"
                 size_hint_y: None
-                height: "80dp"
+                height: "100dp"
                 md_bg_color: 0.9, 1, 0.9, 1
                 padding: "10dp"
                 MDLabel:
@@ -278,10 +265,24 @@ KV = '''
                     text_color: 0, 0.5, 0, 1
                     font_style: "H4"
                     bold: True
+                MDLabel:
+                    id: lbl_split
+                    text: ""
+                    halign: "center"
+                    font_style: "Caption"
+                    size_hint_y: None
+                    height: "20dp"
         
-        MDScrollView:
-            MDList:
-                id: report_list
+        RecycleView:
+            id: report_list
+            viewclass: "OrderRow"
+            on_scroll_y: root.on_list_scroll(self)
+            RecycleBoxLayout:
+                orientation: "vertical"
+                default_size: None, dp(72)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
 
     MDFloatingActionButton:
         id: fab_delete_rep
@@ -311,6 +312,7 @@ KV = '''
         size_hint_y: None
         height: "20dp"
     MDScrollView:
+        id: details_scroll
         MDBoxLayout:
             orientation: "vertical"
             adaptive_height: True
@@ -341,7 +343,9 @@ KV = '''
         height: "100dp"
         spacing: "5dp"
         padding: "5dp"
+'''
 
+KV = '''
 <PaymentDialogContent>:
     orientation: "vertical"
     spacing: "10dp"
@@ -478,18 +482,20 @@ KV = '''
         orientation: "vertical"
         md_bg_color: 0.95, 0.95, 0.95, 1
         MDTopAppBar:
-            title: "Pedidos Activos"
+            title: "Cargando..." if root.loading else "Pedidos Activos"
             md_bg_color: 1, 0.5, 0, 1
             right_action_items: [["chart-bar", lambda x: app.go_to_history_menu()]]
-        MDScrollView:
-            MDGridLayout:
-                id: orders_grid
+        RecycleView:
+            id: orders_grid
+            viewclass: "OrderCard"
+            RecycleGridLayout:
                 cols: 2
                 spacing: "10dp"
                 padding: "10dp"
-                adaptive_height: True
-                row_default_height: "340dp"
-                row_force_default: True
+                default_size: None, dp(340)
+                default_size_hint: 1, None
+                size_hint_y: None
+                height: self.minimum_height
     MDFloatingActionButton:
         icon: "plus"
         md_bg_color: 1, 0.5, 0, 1
@@ -681,6 +687,47 @@ KV = '''
 
 # --- LÓGICA ---
 
+class MenuFactory:
+    # Los MDDropdownMenu se crean recién al abrirlos por primera vez y se reutilizan.
+    # Las claves con la misma lista de opciones (ej. las dos cantidades) comparten un solo menú:
+    # al abrirlo se re-apunta al botón y a la variable de quien lo abrió.
+    def __init__(self, on_select):
+        self.on_select = on_select
+        self.specs = {}; self.menus = {}; self.target = None
+
+    def add(self, key, items, btn, var): self.specs[key] = (tuple(items), btn, var)
+
+    def _get(self, key):
+        items, btn, var = self.specs[key]
+        menu = self.menus.get(items)
+        if menu is None:
+            # Aumentamos width_mult a 5 para que el menú sea más ancho y quepa texto largo
+            menu = self.menus[items] = MDDropdownMenu(
+                caller=btn, items=[{"text": i, "viewclass": "OneLineListItem", "on_release": lambda x=i: self._select(x)} for i in items],
+                width_mult=5, max_height=300)
+        return menu
+
+    def _select(self, txt):
+        btn, var = self.target
+        self.on_select(txt, btn, var)
+
+    def open(self, key):
+        items, btn, var = self.specs[key]
+        menu = self._get(key)
+        self.target = (btn, var); menu.caller = btn
+        menu.open()
+
+    def dismiss(self, key):
+        menu = self.menus.get(self.specs[key][0]) if key in self.specs else None
+        if menu: menu.dismiss()
+
+    def prewarm(self, *args):
+        # Opcional: construye un menú pendiente por frame libre, sin trabar el arranque
+        pending = [k for k, spec in self.specs.items() if spec[0] not in self.menus]
+        if pending:
+            self._get(pending[0])
+            Clock.schedule_once(self.prewarm, 0.1)
+
 class DetailDialogContent(MDBoxLayout):
     title_txt = StringProperty("")
     date_txt = StringProperty("")
@@ -690,9 +737,14 @@ class DetailDialogContent(MDBoxLayout):
 class PaymentDialogContent(MDBoxLayout):
     details_text = StringProperty("")
     total_text = StringProperty("")
-    order_card = ObjectProperty(None)
-    def pay(self, method): self.order_card.process_payment(method)
-    def cancel(self): self.order_card.dialog.dismiss()
+    # El id se copia al abrir: la tarjeta es reciclable y un refresco del tablero puede pasarla a otro pedido
+    order_id = NumericProperty(0)
+    dialog = ObjectProperty(None)
+    def pay(self, method):
+        service.close_order(self.order_id, method)
+        self.dialog.dismiss()
+        MDApp.get_running_app().refresh_home()
+    def cancel(self): self.dialog.dismiss()
 
 class DeleteDialogContent(MDBoxLayout):
     screen = ObjectProperty(None)
@@ -706,26 +758,85 @@ class DeleteDialogContent(MDBoxLayout):
     def cancel_action(self):
         self.dialog.dismiss()
 
+class DialogPool:
+    # Una sola instancia por tipo de diálogo (y por botón): en cada toque solo se
+    # re-enlazan los textos y las acciones vigentes, sin reconstruir el árbol de widgets
+    def __init__(self): self.items = {}; self.actions = {}
+
+    def get(self, key, build):
+        item = self.items.get(key)
+        if item is None: item = self.items[key] = build()
+        return item
+
+    def dialog(self, kind, content_cls, **kwargs):
+        # Devuelve (dialog, content)
+        def build():
+            content = content_cls()
+            return MDDialog(type="custom", content_cls=content, **kwargs), content
+        return self.get(kind, build)
+
+    def button(self, name, text, color, **kwargs):
+        # on_release llama a la acción registrada con on() al momento del toque
+        return self.get(name, lambda: MDRaisedButton(text=text, md_bg_color=color, on_release=lambda x: self.actions[name](), **kwargs))
+
+    def on(self, **actions): self.actions.update(actions)
+
+    def show_actions(self, area, *widgets):
+        # Solo re-arma el área de botones si cambió la combinación
+        if area.children[::-1] == list(widgets): return
+        area.clear_widgets()
+        for w in widgets:
+            if w.parent: w.parent.remove_widget(w)
+            area.add_widget(w)
+
+dialogs = DialogPool()
+
 class OrderCard(MDCard):
     order_id = NumericProperty(0)
     customer_name = StringProperty("")
     order_details = StringProperty("")
     total_price = NumericProperty(0)
-    dialog = None
     
     def open_payment_dialog(self):
-        content = PaymentDialogContent()
+        dialog, content = dialogs.dialog("payment", PaymentDialogContent)
         content.details_text = self.order_details
         content.total_text = f"{self.total_price} Bs"
-        content.order_card = self
-        self.dialog = MDDialog(type="custom", content_cls=content)
-        self.dialog.open()
+        content.order_id = self.order_id; content.dialog = dialog
+        dialog.open()
 
-    def process_payment(self, method):
-        db.mark_delivered(self.order_id, method)
-        if self.dialog: self.dialog.dismiss()
-        app = MDApp.get_running_app()
-        app.refresh_home()
+# Fila reciclable de las listas (RecycleView): solo existen widgets para las filas visibles
+class OrderRow(TwoLineAvatarIconListItem):
+    order_id = NumericProperty(0)
+    icon = StringProperty("cash")
+    icon_color = ListProperty([0, 0, 0, 1])
+    callback = ObjectProperty(None)
+    def on_release(self):
+        if self.callback: self.callback(self.order_id)
+
+def row_data(o, icon, color, callback):
+    return {"order_id": o.id, "text": f"{o.customer_name} - {o.price} Bs", "secondary_text": fmt_ts(o.date),
+            "icon": icon, "icon_color": color, "callback": callback}
+
+def rv_widgets(rv):
+    # Perfilado: cambiar rv.data solo agenda la pasada de vistas para el próximo frame; se hace ya
+    # (así entra en el tiempo medido) y se cuentan las filas con widget (vistas recicladas)
+    rv.refresh_views()
+    return len(rv.children[0].children) if rv.children else 0
+
+def check_icon(selected): return "checkbox-marked" if selected else "checkbox-blank-outline"
+
+def set_rows(rv, index, rows, append=False):
+    # Carga filas al RecycleView y recuerda id -> posición para poder tocar una sola fila después
+    if not append: index.clear()
+    base = len(rv.data) if append else 0
+    index.update({r["order_id"]: base + i for i, r in enumerate(rows)})
+    if append: rv.data.extend(rows)
+    else: rv.data = rows
+
+def toggle_row(rv, index, oid, selected):
+    # Selección: cambia solo el ícono de la fila tocada, sin consultar la BD ni reconstruir la lista
+    i = index.get(oid)
+    if i is not None: rv.data[i] = dict(rv.data[i], icon=check_icon(oid in selected))
 
 # PANTALLA MENÚ HISTORIAL
 class HistoryMenuScreen(Screen):
@@ -735,14 +846,14 @@ class HistoryMenuScreen(Screen):
 class OrderListScreen(Screen):
     mode = "delivered" 
     selection_mode = False
-    selected_ids = []
+    selected_ids = set()
+    after = None; next_key = None; page_loading = False
     
     def on_enter(self):
         self.exit_selection_mode()
         self.load_data()
         
     def load_data(self):
-        self.ids.the_list.clear_widgets()
         app = MDApp.get_running_app()
         
         if self.selection_mode:
@@ -756,69 +867,75 @@ class OrderListScreen(Screen):
             self.ids.fab_delete.disabled = True
             self.ids.fab_delete.opacity = 0
             
+            self.ids.toolbar.title = "Cargando..."
             if self.mode == "delivered":
-                self.ids.toolbar.title = "Pedidos Entregados"
                 self.ids.toolbar.right_action_items = [["trash-can", lambda x: self.ask_delete_mode()]]
-                orders = db.get_orders_by_status("ENTREGADO")
+            else:
+                self.ids.toolbar.right_action_items = [] 
+
+        self.after = None; self.row_index = {}
+        self.request_page()
+
+    def request_page(self):
+        status = "ENTREGADO" if self.mode == "delivered" else "FIADO"
+        self.page_loading = True
+        loader.submit("order_list", self.show_rows, service.list_page, status, self.after, on_error=self.load_failed)
+
+    def on_list_scroll(self, scroll):
+        # Cerca del final de la lista: cargamos la página siguiente
+        if scroll.scroll_y < 0.1 and self.next_key and not self.page_loading:
+            self.after = self.next_key
+            self.request_page()
+
+    def load_failed(self, error):
+        # Se puede reintentar: al volver a entrar o al seguir bajando (la página pedida no avanzó)
+        self.page_loading = False
+        if not self.selection_mode: self.ids.toolbar.title = "Error al cargar"
+
+    @profiled(profiler, "order_list.load_data", lambda self: rv_widgets(self.ids.the_list))
+    def show_rows(self, orders):
+        self.page_loading = False
+        self.next_key = next_page_key(orders)
+        if not self.selection_mode:
+            if self.mode == "delivered":
+                self.ids.toolbar.title = "Pedidos Entregados"
                 icon_n = "check-circle"
                 col = (0, 0.6, 0, 1)
             else:
                 self.ids.toolbar.title = "Fiados (Por Cobrar)"
-                self.ids.toolbar.right_action_items = [] 
-                orders = db.get_orders_by_status("FIADO")
                 icon_n = "alert-circle"
                 col = (1, 0, 0, 1)
-
-        if not self.selection_mode:
-            for o in orders:
-                oid, name, price, date = o[0], o[1], o[3], o[6]
-                if self.mode == "delivered" and o[7]: date = o[7] 
-                item = TwoLineAvatarIconListItem(
-                    text=f"{name} - {price} Bs",
-                    secondary_text=f"{date}",
-                    on_release=lambda x, order=o: self.show_details(order)
-                )
-                item.add_widget(IconLeftWidget(icon=icon_n, theme_text_color="Custom", text_color=col))
-                self.ids.the_list.add_widget(item)
+            rows = [row_data(o, icon_n, col, self.show_details) for o in orders]
         else:
-            orders = db.get_orders_by_status("ENTREGADO" if self.mode=="delivered" else "FIADO")
-            for o in orders:
-                oid = o[0]
-                is_selected = oid in self.selected_ids
-                icon_n = "checkbox-marked" if is_selected else "checkbox-blank-outline"
-                item = TwoLineAvatarIconListItem(
-                    text=f"{o[1]} - {o[3]} Bs",
-                    secondary_text=f"{o[6]}",
-                    on_release=lambda x, order_id=oid: self.toggle_selection(order_id)
-                )
-                item.add_widget(IconLeftWidget(icon=icon_n, theme_text_color="Custom", text_color=(0,0,0,1)))
-                self.ids.the_list.add_widget(item)
+            rows = [row_data(o, check_icon(o.id in self.selected_ids), (0,0,0,1), self.toggle_selection) for o in orders]
+        # Solo datos: el RecycleView crea/recicla los widgets de las filas visibles
+        set_rows(self.ids.the_list, self.row_index, rows, append=self.after is not None)
 
     def ask_delete_mode(self):
-        content = DeleteDialogContent()
+        self.dialog_del, content = dialogs.dialog("delete", DeleteDialogContent)
         content.screen = self
-        self.dialog_del = MDDialog(type="custom", content_cls=content)
         content.dialog = self.dialog_del
         self.dialog_del.open()
 
     def start_selection_mode(self):
         self.selection_mode = True
-        self.selected_ids = []
+        self.selected_ids = set()
         self.load_data()
 
     def exit_selection_mode(self):
         self.selection_mode = False
-        self.selected_ids = []
+        self.selected_ids = set()
         self.load_data()
 
     def toggle_selection(self, oid):
-        if oid in self.selected_ids: self.selected_ids.remove(oid)
-        else: self.selected_ids.append(oid)
-        self.load_data()
+        if oid in self.selected_ids: self.selected_ids.discard(oid)
+        else: self.selected_ids.add(oid)
+        toggle_row(self.ids.the_list, self.row_index, oid, self.selected_ids)
+        self.ids.toolbar.title = f"Selec: {len(self.selected_ids)}"
 
     def delete_selected_items(self):
         if not self.selected_ids: return
-        for oid in self.selected_ids: db.delete_order(oid)
+        db.delete_orders(self.selected_ids)
         self.exit_selection_mode()
 
     def confirm_delete_all(self):
@@ -837,36 +954,32 @@ class OrderListScreen(Screen):
         dialog.dismiss()
         self.load_data()
 
-    def show_details(self, order):
-        oid, name, details, price, status, pay_method, date_created, date_paid = order[0], order[1], order[2], order[3], order[4], order[5], order[6], order[7]
-        
-        pretty_details = ""
-        cart_json = order[10]
-        try:
-            cart = json.loads(cart_json)
-            for item in cart:
-                pretty_details += f"[b]{item['qty']}x[/b] {item['desc']} - {item['price']} Bs\n"
-            if order[9] and order[9] > 0: pretty_details += f"Moto: {order[9]} Bs\n"
-        except: pretty_details = details
-
-        content = DetailDialogContent()
-        content.title_txt = name
-        content.date_txt = f"Pedido: {date_created}\nEstado: DEBE" if status == "FIADO" else f"Pagado: {date_paid}\n({pay_method})"
+    def show_details(self, oid):
+        # La fila completa se carga recién al abrir el detalle; el markup viene ya renderizado
+        order, pretty_details = db.get_order_details(oid)
+        if not order: return
+
+        status = order.status
+        self.dialog, content = dialogs.dialog("detail", DetailDialogContent)
+        content.title_txt = order.customer_name
+        content.date_txt = f"Pedido: {fmt_ts(order.date_created)}\nEstado: DEBE" if status == "FIADO" else f"Pagado: {fmt_ts(order.date_paid)}\n({order.payment_method})"
         content.details_txt = pretty_details
-        content.total_txt = f"{price} Bs"
-        
-        layout = content.ids.action_area
-        self.dialog = MDDialog(type="custom", content_cls=content)
+        content.total_txt = f"{order.price} Bs"
+        content.ids.details_scroll.scroll_y = 1
+        dialogs.on(detail_close=self.dialog.dismiss, detail_pay=lambda: self.prompt_payment_method(oid), detail_delete=lambda: self.delete_and_refresh(oid))
 
+        close = dialogs.button("detail_close", "CERRAR", (0.5,0.5,0.5,1), size_hint_x=0.8, pos_hint={"center_x": 0.5})
+        close.text = "CANCELAR" if status == "FIADO" else "CERRAR"
         if status == "FIADO":
             # Botones centrados
-            box = MDBoxLayout(orientation="horizontal", spacing="10dp", adaptive_size=True, pos_hint={"center_x": 0.5})
-            box.add_widget(MDRaisedButton(text="PAGADO", md_bg_color=(0,0.6,0.2,1), on_release=lambda x: self.prompt_payment_method(oid)))
-            box.add_widget(MDRaisedButton(text="ELIMINAR", md_bg_color=(0.8,0.2,0.2,1), on_release=lambda x: self.delete_and_refresh(oid)))
-            layout.add_widget(box)
-            layout.add_widget(MDRaisedButton(text="CANCELAR", md_bg_color=(0.5,0.5,0.5,1), size_hint_x=0.8, pos_hint={"center_x": 0.5}, on_release=lambda x: self.dialog.dismiss()))
+            def build_box():
+                box = MDBoxLayout(orientation="horizontal", spacing="10dp", adaptive_size=True, pos_hint={"center_x": 0.5})
+                box.add_widget(dialogs.button("detail_pay", "PAGADO", (0,0.6,0.2,1)))
+                box.add_widget(dialogs.button("detail_delete", "ELIMINAR", (0.8,0.2,0.2,1)))
+                return box
+            dialogs.show_actions(content.ids.action_area, dialogs.get("detail_credit_box", build_box), close)
         else:
-            layout.add_widget(MDRaisedButton(text="CERRAR", md_bg_color=(0.5,0.5,0.5,1), size_hint_x=0.8, pos_hint={"center_x": 0.5}, on_release=lambda x: self.dialog.dismiss()))
+            dialogs.show_actions(content.ids.action_area, close)
             
         self.dialog.open()
 
@@ -875,47 +988,52 @@ class OrderListScreen(Screen):
         self.dialog.dismiss()
         self.load_data()
 
-    def prompt_payment_method(self, oid):
-        self.dialog.dismiss()
+    def build_payment_method_content(self):
         content = MDBoxLayout(orientation="vertical", size_hint_y=None, height="120dp", spacing="10dp", padding="10dp")
         row = MDBoxLayout(orientation="horizontal", spacing="10dp", adaptive_size=True, pos_hint={"center_x": 0.5})
-        row.add_widget(MDRaisedButton(text="EFECTIVO", md_bg_color=(0,0.6,0.2,1), on_release=lambda x: self.pay_confirm(oid, "EFECTIVO")))
-        row.add_widget(MDRaisedButton(text="QR", md_bg_color=(0,0.5,0.8,1), on_release=lambda x: self.pay_confirm(oid, "QR")))
+        row.add_widget(dialogs.button("pay_cash", "EFECTIVO", (0,0.6,0.2,1)))
+        row.add_widget(dialogs.button("pay_qr", "QR", (0,0.5,0.8,1)))
         content.add_widget(row)
-        content.add_widget(MDRaisedButton(text="CANCELAR", size_hint_x=0.8, pos_hint={"center_x":0.5}, md_bg_color=(0.5,0.5,0.5,1), on_release=lambda x: self.pay_dialog.dismiss()))
-        
-        self.pay_dialog = MDDialog(title="¿Cómo pagó?", type="custom", content_cls=content)
+        content.add_widget(dialogs.button("pay_cancel", "CANCELAR", (0.5,0.5,0.5,1), size_hint_x=0.8, pos_hint={"center_x":0.5}))
+        return content
+
+    def prompt_payment_method(self, oid):
+        self.dialog.dismiss()
+        self.pay_dialog, content = dialogs.dialog("payment_method", self.build_payment_method_content, title="¿Cómo pagó?")
+        dialogs.on(pay_cash=lambda: self.pay_confirm(oid, "EFECTIVO"), pay_qr=lambda: self.pay_confirm(oid, "QR"), pay_cancel=self.pay_dialog.dismiss)
         self.pay_dialog.open()
 
     def pay_confirm(self, oid, method):
-        db.pay_credit_order(oid, method)
+        service.settle_credit(oid, method)
         self.pay_dialog.dismiss()
         self.load_data() 
 
 # PANTALLA REPORTES
 class ReportScreen(Screen):
     sel_filter = "Ninguno"
-    sel_day = "Todos"; sel_month = "Todos"; sel_year = "2026"; menus = {}
-    selection_mode = False; selected_ids = []
+    sel_day = "Todos"; sel_month = "Todos"; sel_year = "2026"
+    selection_mode = False; selected_ids = set()
+    ranges = []; query = ""; after = None; next_key = None; page_loading = False; match_count = 0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.menus = MenuFactory(self.set_val)
+        self.create_menus()
 
     def on_enter(self): 
-        if not self.menus: self.create_menus()
         self.exit_selection_mode()
         
     def create_menus(self):
+        # Solo se registran; cada menú se construye al abrirlo
         filters = ["Ninguno", "Hoy", "Última Semana", "Último Mes", "Último Año"]
         days = ["Todos"] + [str(i) for i in range(1, 32)]
         months = ["Todos", "01", "02", "03", "04", "05", "06", "07", "08", "09", "10", "11", "12"]
         years = ["2026", "2027", "2028", "2029", "2030"]
         
-        self.menus['filter'] = self._make(filters, self.ids.btn_filter, 'sel_filter')
-        self.menus['day'] = self._make(days, self.ids.btn_day, 'sel_day')
-        self.menus['month'] = self._make(months, self.ids.btn_month, 'sel_month')
-        self.menus['year'] = self._make(years, self.ids.btn_year, 'sel_year')
-
-    def _make(self, items, btn, var):
-        # Aumentamos width_mult a 5 para que quepa texto largo en el menú
-        return MDDropdownMenu(caller=btn, items=[{"text": i, "viewclass": "OneLineListItem", "on_release": lambda x=i: self.set_val(x, btn, var)} for i in items], width_mult=5, max_height=300)
+        self.menus.add('filter', filters, self.ids.btn_filter, 'sel_filter')
+        self.menus.add('day', days, self.ids.btn_day, 'sel_day')
+        self.menus.add('month', months, self.ids.btn_month, 'sel_month')
+        self.menus.add('year', years, self.ids.btn_year, 'sel_year')
 
     def set_val(self, txt, btn, var):
         setattr(self, var, txt)
@@ -940,9 +1058,12 @@ class ReportScreen(Screen):
             label = var.split('_')[1].capitalize()
             btn.text = f"{label}: {txt}"
             
-        self.menus[var.replace('sel_', '')].dismiss()
+        self.menus.dismiss(var.replace('sel_', ''))
+
+    def open_menu(self, key): self.menus.open(key)
 
-    def open_menu(self, key): self.menus[key].open()
+    def get_ranges(self):
+        return service.report_ranges(self.sel_filter, self.sel_day, self.sel_month, self.sel_year)
 
     def generate_report(self):
         app = MDApp.get_running_app()
@@ -950,82 +1071,72 @@ class ReportScreen(Screen):
         self.run_filter()
 
     def run_filter(self):
-        all_orders = db.get_report_data()
-        filtered = []; total = 0
-        now = datetime.now()
-        
-        for o in all_orders:
-            if not o[7]: continue 
-            d_obj = datetime.strptime(o[7], "%Y-%m-%d %H:%M:%S")
-            
-            match = True
-            # Logica Especial
-            if self.sel_filter == "Hoy":
-                if d_obj.date() != now.date(): match = False
-            elif self.sel_filter == "Última Semana":
-                if d_obj < now - timedelta(days=7): match = False
-            elif self.sel_filter == "Último Mes":
-                if d_obj < now - timedelta(days=30): match = False
-            elif self.sel_filter == "Último Año":
-                if d_obj < now - timedelta(days=365): match = False
-            elif self.sel_filter == "Ninguno":
-                # Logica Manual
-                if str(d_obj.year) != self.sel_year: match = False
-                if self.sel_month != "Todos" and f"{d_obj.month:02d}" != self.sel_month: match = False
-                if self.sel_day != "Todos" and str(d_obj.day) != self.sel_day: match = False
-            
-            if match:
-                filtered.append(o); total += o[3]
+        self.ids.lbl_result.text = "Cargando..."
+        self.ranges = self.get_ranges(); self.query = self.ids.search_field.text.strip(); self.after = None; self.row_index = {}
+        self.request_page()
+
+    def request_page(self):
+        self.page_loading = True
+        loader.submit("report", self.show_report, service.report_page, self.ranges, self.after, self.query, on_error=self.load_failed)
+
+    def on_list_scroll(self, scroll):
+        if scroll.scroll_y < 0.1 and self.next_key and not self.page_loading:
+            self.after = self.next_key
+            self.request_page()
+
+    def load_failed(self, error):
+        self.page_loading = False
+        self.ids.lbl_result.text = "Error al cargar el reporte"
+
+    @profiled(profiler, "report.run_filter", lambda self: rv_widgets(self.ids.report_list))
+    def show_report(self, result):
+        filtered, summary = result
+        self.page_loading = False
+        self.next_key = None if fts_query(self.query) else next_page_key(filtered)
+        if self.after is None: self.show_header(summary)
+        if self.selection_mode:
+            rows = [row_data(o, check_icon(o.id in self.selected_ids), (0,0,0,1), self.toggle_selection) for o in filtered]
+        else:
+            rows = [row_data(o, "cash", (0,0,0,1), self.show_details_report) for o in filtered]
+        set_rows(self.ids.report_list, self.row_index, rows, append=self.after is not None)
 
-        self.ids.report_list.clear_widgets()
-        self.ids.toolbar.right_action_items = [["trash-can", lambda x: self.ask_delete_mode()]]
-        
+    def show_header(self, summary):
+        # Primera página: arma la barra y muestra los totales del filtro completo
+        self.ids.toolbar.right_action_items = [["file-export", lambda x: self.ask_export()], ["trash-can", lambda x: self.ask_delete_mode()]]
         if self.selection_mode:
             self.ids.toolbar.title = f"Selec: {len(self.selected_ids)}"
             self.ids.toolbar.left_action_items = [["close", lambda x: self.exit_selection_mode()]]
             self.ids.fab_delete_rep.disabled = False; self.ids.fab_delete_rep.opacity = 1
-            
-            for o in filtered:
-                oid = o[0]
-                is_selected = oid in self.selected_ids
-                icon_n = "checkbox-marked" if is_selected else "checkbox-blank-outline"
-                item = TwoLineAvatarIconListItem(
-                    text=f"{o[1]} - {o[3]} Bs", secondary_text=f"{o[7]}",
-                    on_release=lambda x, order_id=oid: self.toggle_selection(order_id)
-                )
-                item.add_widget(IconLeftWidget(icon=icon_n, theme_text_color="Custom", text_color=(0,0,0,1)))
-                self.ids.report_list.add_widget(item)
         else:
             app = MDApp.get_running_app()
             self.ids.toolbar.title = "Resultados"
             self.ids.toolbar.left_action_items = [["arrow-left", lambda x: app.go_to_history_menu()]]
             self.ids.fab_delete_rep.disabled = True; self.ids.fab_delete_rep.opacity = 0
-            
-            for o in filtered:
-                item = TwoLineAvatarIconListItem(text=f"{o[1]} - {o[3]} Bs", secondary_text=f"{o[7]}", on_release=lambda x, order=o: self.show_details_report(order))
-                item.add_widget(IconLeftWidget(icon="cash"))
-                self.ids.report_list.add_widget(item)
-                
-        self.ids.lbl_result.text = f"TOTAL: {total} Bs"
+        self.match_count = summary['orders']
+        self.ids.lbl_result.text = f"TOTAL: {summary['total']} Bs"
+        self.ids.lbl_split.text = (f"{summary['orders']} pedidos  |  EFECTIVO: {summary['cash_total']} Bs ({summary['cash_orders']})"
+                                   f"  |  QR: {summary['qr_total']} Bs ({summary['qr_orders']})")
 
     # LOGICA SELECCION REPORTE
     def ask_delete_mode(self):
-        content = DeleteDialogContent()
+        self.dialog_del, content = dialogs.dialog("delete", DeleteDialogContent)
         content.screen = self
-        self.dialog_del = MDDialog(type="custom", content_cls=content)
         content.dialog = self.dialog_del
         self.dialog_del.open()
-    def start_selection_mode(self): self.selection_mode = True; self.selected_ids = []; self.run_filter()
-    def exit_selection_mode(self): self.selection_mode = False; self.selected_ids = []; self.run_filter()
+    def start_selection_mode(self): self.selection_mode = True; self.selected_ids = set(); self.run_filter()
+    def exit_selection_mode(self): self.selection_mode = False; self.selected_ids = set(); self.run_filter()
     def toggle_selection(self, oid):
-        if oid in self.selected_ids: self.selected_ids.remove(oid)
-        else: self.selected_ids.append(oid)
-        self.run_filter()
+        if oid in self.selected_ids: self.selected_ids.discard(oid)
+        else: self.selected_ids.add(oid)
+        toggle_row(self.ids.report_list, self.row_index, oid, self.selected_ids)
+        self.ids.toolbar.title = f"Selec: {len(self.selected_ids)}"
     def delete_selected_items(self):
-        for oid in self.selected_ids: db.delete_order(oid)
+        db.delete_orders(self.selected_ids)
         self.exit_selection_mode()
     def confirm_delete_all(self):
-        d2 = MDDialog(title="¿BORRAR TODO?", text="Se borrarán TODOS los pedidos visibles.", buttons=[MDFlatButton(text="NO", on_release=lambda x: d2.dismiss()), MDRaisedButton(text="SÍ", md_bg_color=(1,0,0,1), on_release=lambda x: self.do_clear_all(d2))])
+        if fts_query(self.query): text = f"Se borrarán los {len(self.row_index)} pedidos mostrados."
+        else: text = f"Se borrarán los {self.match_count} pedidos del filtro."
+        d2 = MDDialog(title="¿BORRAR TODO?", text=text, buttons=[MDFlatButton(text="NO", on_release=lambda x: d2.dismiss()), MDRaisedButton(text="SÍ", md_bg_color=(1,0,0,1), on_release=lambda x: self.do_clear_all(d2))])
         d2.open()
     def do_clear_all(self, d): 
         # Borra solo lo filtrado
@@ -1034,40 +1145,52 @@ class ReportScreen(Screen):
         d.dismiss()
         self.run_filter()
 
+    # EXPORTAR (CSV / JSON Lines) el filtro actual, en segundo plano
+    def build_export_content(self):
+        content = MDBoxLayout(orientation="vertical", size_hint_y=None, height="120dp", spacing="10dp", padding="10dp")
+        row = MDBoxLayout(orientation="horizontal", spacing="10dp", adaptive_size=True, pos_hint={"center_x": 0.5})
+        row.add_widget(dialogs.button("export_csv", "CSV", (0,0.6,0.2,1)))
+        row.add_widget(dialogs.button("export_jsonl", "JSON", (0,0.5,0.8,1)))
+        content.add_widget(row)
+        content.add_widget(dialogs.button("export_cancel", "CANCELAR", (0.5,0.5,0.5,1), size_hint_x=0.8, pos_hint={"center_x":0.5}))
+        return content
+
+    def ask_export(self):
+        self.export_dialog, content = dialogs.dialog("export", self.build_export_content, title="Exportar reporte")
+        dialogs.on(export_csv=lambda: self.start_export("csv"), export_jsonl=lambda: self.start_export("jsonl"), export_cancel=self.export_dialog.dismiss)
+        self.export_dialog.open()
+
+    def start_export(self, fmt):
+        # Se exporta lo que muestra la pantalla: filtro y búsqueda de la última consulta, no el estado de los menús
+        self.export_dialog.dismiss()
+        folder = os.environ.get("POLLOS_EXPORT_DIR") or MDApp.get_running_app().user_data_dir
+        path = os.path.join(folder, f"reporte_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}")
+        self.ids.lbl_split.text = "Exportando..."
+        loader.submit("export", self.export_done, service.export, self.ranges, self.query, fmt, path,
+                      on_error=self.export_failed)
+
+    def export_done(self, result):
+        path, n = result
+        self.ids.lbl_split.text = f"Exportados {n} pedidos: {path}"
+
+    def export_failed(self, error): self.ids.lbl_split.text = f"Error al exportar: {error}"
+
     def run_filter_delete_logic(self):
-        all_orders = db.get_report_data()
-        now = datetime.now()
-        for o in all_orders:
-            if not o[7]: continue
-            d_obj = datetime.strptime(o[7], "%Y-%m-%d %H:%M:%S")
-            match = True
-            if self.sel_filter == "Hoy":
-                if d_obj.date() != now.date(): match = False
-            elif self.sel_filter == "Última Semana":
-                if d_obj < now - timedelta(days=7): match = False
-            elif self.sel_filter == "Último Mes":
-                if d_obj < now - timedelta(days=30): match = False
-            elif self.sel_filter == "Último Año":
-                if d_obj < now - timedelta(days=365): match = False
-            elif self.sel_filter == "Ninguno":
-                if str(d_obj.year) != self.sel_year: match = False
-                if self.sel_month != "Todos" and f"{d_obj.month:02d}" != self.sel_month: match = False
-                if self.sel_day != "Todos" and str(d_obj.day) != self.sel_day: match = False
-            if match:
-                db.delete_order(o[0])
-
-    def show_details_report(self, order):
-        details = order[2]
-        try:
-            cart = json.loads(order[10])
-            details = ""
-            for item in cart: details += f"[b]{item['qty']}x[/b] {item['desc']} - {item['price']} Bs\n"
-            if order[9] > 0: details += f"Moto: {order[9]} Bs"
-        except: pass
-        content = DetailDialogContent()
-        content.title_txt = order[1]; content.date_txt = order[7]; content.details_txt = details; content.total_txt = f"{order[3]} Bs"
-        content.ids.action_area.add_widget(MDRaisedButton(text="CERRAR", size_hint_x=0.8, pos_hint={"center_x":0.5}, on_release=lambda x: self.dialog.dismiss()))
-        self.dialog = MDDialog(type="custom", content_cls=content); self.dialog.open()
+        # Se borra lo que se está mostrando (filtro y búsqueda de la última consulta, no el estado de los menús).
+        # Con búsqueda: solo las filas mostradas (hasta SEARCH_LIMIT, por relevancia), no todas las coincidencias
+        if fts_query(self.query): db.delete_orders(list(self.row_index))
+        else: db.delete_report_orders(self.ranges)
+
+    def show_details_report(self, oid):
+        order, details = db.get_order_details(oid)
+        if not order: return
+        self.dialog, content = dialogs.dialog("detail", DetailDialogContent)
+        content.title_txt = order.customer_name; content.date_txt = fmt_ts(order.date_paid); content.details_txt = details; content.total_txt = f"{order.price} Bs"
+        content.ids.details_scroll.scroll_y = 1
+        dialogs.on(detail_close=self.dialog.dismiss)
+        close = dialogs.button("detail_close", "CERRAR", (0.5,0.5,0.5,1), size_hint_x=0.8, pos_hint={"center_x":0.5}); close.text = "CERRAR"
+        dialogs.show_actions(content.ids.action_area, close)
+        self.dialog.open()
 
 # --- ADD ORDER LOGIC ---
 class CartItem(OneLineAvatarIconListItem):
@@ -1083,31 +1206,30 @@ class AddOrderScreen(Screen):
     sel_food = "Pollo Broaster"; sel_cut = "Pierna"; sel_variant = "Normal (Arroz y Papa)"
     sel_soda = "Ninguna"; sel_delivery = "Para Mesa"; sel_qty_food = "1"; sel_qty_soda = "1"
 
-    def __init__(self, **kwargs): super().__init__(**kwargs); self.menus = {}
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.menus = MenuFactory(self.set_item)
+        self.create_menus()
     def on_enter(self):
-        if not self.menus: self.create_menus()
         self.update_ui_state()
     def create_menus(self):
+        # Solo se registran; cada menú se construye al abrirlo (las cantidades comparten uno)
         foods = ["Pollo Broaster", "Pollo a la Plancha", "Hamburguesa", "Salchipapa", "Solo Porción", "Ninguna"]
         cuts = ["Ala", "Pierna", "Contra", "Pecho"]
         variants = ["Normal (Arroz y Papa)", "Solo Papa", "Solo Arroz", "Ninguna"]
         sodas = ["Ninguna", "Mendocina 3L", "Mendocina 1L", "Coca 3L", "Coca Peque", "Oro Peque"]
         delivery = ["Para Mesa", "Para Llevar (Persona)", "Para Llevar (Moto)"]
         quantities = [str(i) for i in range(1, 21)]
-        self.menus['food'] = self._make(foods, self.ids.btn_food, 'sel_food')
-        self.menus['cut'] = self._make(cuts, self.ids.btn_cut, 'sel_cut')
-        self.menus['variant'] = self._make(variants, self.ids.btn_variant, 'sel_variant')
-        self.menus['soda'] = self._make(sodas, self.ids.btn_soda, 'sel_soda')
-        self.menus['delivery'] = self._make(delivery, self.ids.btn_delivery, 'sel_delivery')
-        self.menus['qty_food'] = self._make(quantities, self.ids.btn_qty_food, 'sel_qty_food')
-        self.menus['qty_soda'] = self._make(quantities, self.ids.btn_qty_soda, 'sel_qty_soda')
-    def _make(self, items, btn, var):
-        # Aumentamos width_mult a 5 para que el menú sea más ancho y quepa texto largo
-        return MDDropdownMenu(caller=btn, items=[{"text": i, "viewclass": "OneLineListItem", "on_release": lambda x=i: self.set_item(x, btn, var)} for i in items], width_mult=5, max_height=300)
+        self.menus.add('food', foods, self.ids.btn_food, 'sel_food')
+        self.menus.add('cut', cuts, self.ids.btn_cut, 'sel_cut')
+        self.menus.add('variant', variants, self.ids.btn_variant, 'sel_variant')
+        self.menus.add('soda', sodas, self.ids.btn_soda, 'sel_soda')
+        self.menus.add('delivery', delivery, self.ids.btn_delivery, 'sel_delivery')
+        self.menus.add('qty_food', quantities, self.ids.btn_qty_food, 'sel_qty_food')
+        self.menus.add('qty_soda', quantities, self.ids.btn_qty_soda, 'sel_qty_soda')
     def set_item(self, txt, btn, var):
         setattr(self, var, txt); btn.text = txt; btn.text_color = (0,0,0,1)
-        k = var.replace('sel_', ''); 
-        if k in self.menus: self.menus[k].dismiss()
+        self.menus.dismiss(var.replace('sel_', ''))
         if var == "sel_delivery": self.check_moto()
         if var in ["sel_food", "sel_soda"]: self.update_ui_state()
 
@@ -1139,41 +1261,15 @@ class AddOrderScreen(Screen):
 
     def enable(self, btn): btn.disabled=False; btn.md_bg_color=(1,1,1,0); btn.text_color=(0,0,0,1)
     def disable(self, btn): btn.disabled=True; btn.text="---"; btn.md_bg_color=(0.9,0.9,0.9,1); btn.text_color=(0.5,0.5,0.5,1)
-    def open_menu(self, k): self.menus[k].open()
-    def open_qty_menu(self, k): self.menus[f'qty_{k}'].open()
+    def open_menu(self, k): self.menus.open(k)
+    def open_qty_menu(self, k): self.menus.open(f'qty_{k}')
 
     def get_prices(self):
-        f = self.sel_food; fp = 0; fd = ""
-        # Si Soda está activa, ignoramos comida
-        if self.sel_soda == "Ninguna" and f != "Ninguna":
-            if f == "Pollo Broaster":
-                b = 18 if self.sel_cut == "Pecho" else 16
-                if self.sel_variant == "Solo Papa": b+=1
-                fp=b; fd=f"Pollo {self.sel_cut}"
-                if self.sel_variant != "Normal (Arroz y Papa)": fd+=f" [{self.sel_variant}]"
-            elif f == "Pollo a la Plancha": fp=20; fd="Pollo Plancha"
-            elif f == "Hamburguesa": fp=17; fd="Hamburguesa"
-            elif f == "Salchipapa": fp=16; fd="Salchipapa"
-            elif f == "Solo Porción":
-                p=4
-                if self.sel_variant=="Normal (Arroz y Papa)": p=8
-                elif self.sel_variant=="Solo Papa": p=7
-                fp=p; fd=f"Porción {self.sel_variant}"
-        
-        s = self.sel_soda; sp=0; sd=""
-        sods = {"Mendocina 3L": 15, "Mendocina 1L": 7, "Coca 3L": 20, "Coca Peque": 5, "Oro Peque": 3}
-        if s in sods: sp=sods[s]; sd=s
-        return fp, fd, sp, sd
+        return service.prices(self.sel_food, self.sel_cut, self.sel_variant, self.sel_soda)
 
     def add_item_to_cart(self):
-        fp, fd, sp, sd = self.get_prices()
-        if fp > 0:
-            q = int(self.sel_qty_food)
-            self.cart.append({"qty": q, "desc": fd, "unit_price": fp, "price": fp*q})
-        if sp > 0:
-            q = int(self.sel_qty_soda)
-            self.cart.append({"qty": q, "desc": sd, "unit_price": sp, "price": sp*q})
-        
+        self.cart.extend(service.cart_lines(self.sel_food, self.sel_cut, self.sel_variant, self.sel_soda,
+                                            self.sel_qty_food, self.sel_qty_soda))
         self.update_cart()
         # Reset visual
         self.set_item("1", self.ids.btn_qty_food, "sel_qty_food")
@@ -1182,24 +1278,14 @@ class AddOrderScreen(Screen):
 
     def remove_item(self, i):
         if 0 <= i < len(self.cart): self.cart.pop(i); self.update_cart()
+    @profiled(profiler, "add_order.update_cart", lambda self: len(self.ids.cart_list.children))
     def update_cart(self):
-        self.ids.cart_list.clear_widgets(); gt = 0
-        for i, item in enumerate(self.cart):
-            gt += item['price']; self.ids.cart_list.add_widget(CartItem(item, i, self.remove_item))
-        try: gt += float(self.ids.moto_input.text)
-        except: pass
-        self.ids.lbl_total.text = f"TOTAL: {gt} Bs"
+        self.ids.cart_list.clear_widgets()
+        for i, item in enumerate(self.cart): self.ids.cart_list.add_widget(CartItem(item, i, self.remove_item))
+        self.ids.lbl_total.text = f"TOTAL: {service.cart_total(self.cart, self.ids.moto_input.text)} Bs"
     def save_order_final(self):
         if not self.cart: return
-        name = self.ids.name_input.text or "Cliente"
-        total = 0; details = ""
-        for i in self.cart: total+=i['price']; details+=f"{i['qty']}x {i['desc']} ({i['price']} Bs)\n"
-        moto=0
-        try: moto=float(self.ids.moto_input.text); total+=moto; details+=f"Moto: {moto} Bs\n"
-        except: pass
-        details+=f"({self.sel_delivery})"
-        if self.editing_id: db.update_order(self.editing_id, name, details, total, self.sel_delivery, moto, self.cart)
-        else: db.add_order(name, details, total, self.sel_delivery, moto, self.cart)
+        service.save_order(self.ids.name_input.text, self.cart, self.sel_delivery, self.ids.moto_input.text, self.editing_id)
         app = MDApp.get_running_app(); app.refresh_home(); app.cancel_add()
     def clear_form(self):
         self.editing_id = None; self.cart = []; self.update_cart()
@@ -1213,27 +1299,65 @@ class AddOrderScreen(Screen):
         self.set_item("1", self.ids.btn_qty_food, "sel_qty_food")
         self.set_item("1", self.ids.btn_qty_soda, "sel_qty_soda")
     def load_order_data(self, order_data):
-        self.editing_id = order_data[0]; self.ids.toolbar.title = "Editar Pedido"; self.ids.save_btn.text = "ACTUALIZAR"
-        self.ids.name_input.text = order_data[1]; self.set_item(order_data[8], self.ids.btn_delivery, "sel_delivery")
-        if order_data[9]: self.ids.moto_input.text = str(order_data[9])
-        try: 
-            if order_data[10]: self.cart = json.loads(order_data[10]); self.update_cart()
-        except: pass
+        self.editing_id = order_data.id; self.ids.toolbar.title = "Editar Pedido"; self.ids.save_btn.text = "ACTUALIZAR"
+        self.ids.name_input.text = order_data.customer_name; self.set_item(order_data.delivery_type, self.ids.btn_delivery, "sel_delivery")
+        if order_data.moto_price: self.ids.moto_input.text = str(order_data.moto_price)
+        self.cart = db.get_cart(order_data.id); self.update_cart()
 
-class HomeScreen(Screen): pass
+class HomeScreen(Screen):
+    loading = BooleanProperty(False)
 
 class PollosApp(MDApp):
+    history_screens = {'history_menu': HistoryMenuScreen, 'order_list': OrderListScreen, 'report': ReportScreen}
+    history_loaded = False
+
     def build(self):
         self.theme_cls.primary_palette = "Orange"
         Builder.load_string(KV)
         sm = ScreenManager()
         sm.add_widget(HomeScreen(name='home'))
         sm.add_widget(AddOrderScreen(name='add_order'))
-        sm.add_widget(HistoryMenuScreen(name='history_menu'))
-        sm.add_widget(OrderListScreen(name='order_list'))
-        sm.add_widget(ReportScreen(name='report'))
+        # POLLOS_LAZY_SCREENS=1: el arranque solo arma inicio y "Nuevo Pedido"; el historial se crea al navegar
+        if os.environ.get("POLLOS_LAZY_SCREENS") != "1":
+            for name in self.history_screens: self.get_screen(name, sm)
         return sm
-    def on_start(self): self.refresh_home()
+    def get_screen(self, name, sm=None):
+        sm = sm or self.root
+        if not sm.has_screen(name):
+            if not self.history_loaded: Builder.load_string(KV_HISTORY); self.history_loaded = True
+            sm.add_widget(self.history_screens[name](name=name))
+        return sm.get_screen(name)
+    def on_start(self):
+        self.refresh_home()
+        # POLLOS_PREWARM_MENUS=1: arma los menús de "Nuevo Pedido" en frames libres tras el arranque
+        if os.environ.get("POLLOS_PREWARM_MENUS") == "1":
+            Clock.schedule_once(self.root.get_screen('add_order').menus.prewarm, 1)
+        # Archivado en segundo plano de ENTREGADO con más de POLLOS_ARCHIVE_DAYS días (0 = desactivado)
+        days = int(os.environ.get("POLLOS_ARCHIVE_DAYS", "180"))
+        if days > 0:
+            Clock.schedule_once(lambda dt: threading.Thread(target=db.archive_old, args=(days,), name="db-archive", daemon=True).start(), 10)
+        # Sincronización LAN: POLLOS_SYNC_SERVE=1 atiende a los otros dispositivos (puerto POLLOS_SYNC_PORT);
+        # POLLOS_SYNC_URL=http://<ip>:8765 se conecta a ese servidor. Ambos lados necesitan el mismo POLLOS_SYNC_TOKEN
+        self.sync = []; synced = lambda: Clock.schedule_once(lambda dt: self.refresh_home())
+        token = os.environ.get("POLLOS_SYNC_TOKEN", "")
+        if (os.environ.get("POLLOS_SYNC_SERVE") == "1" or os.environ.get("POLLOS_SYNC_URL")) and not token:
+            Logger.error("Pollos: sincronización desactivada, falta POLLOS_SYNC_TOKEN")
+        elif token:
+            if os.environ.get("POLLOS_SYNC_SERVE") == "1":
+                self.sync.append(SyncServer(db, token, port=int(os.environ.get("POLLOS_SYNC_PORT", PORT)), on_change=synced).start())
+            if os.environ.get("POLLOS_SYNC_URL"):
+                self.sync.append(SyncClient(db, os.environ["POLLOS_SYNC_URL"], token, on_change=synced).start())
+        if profiler:
+            Clock.schedule_interval(self.watch_frame, 0); Clock.schedule_interval(profiler.dump, 60)
+    def watch_frame(self, dt):
+        # Frames de más de 1/30 s: lo que el cajero ve como "se congela" (incluye el layout de las listas)
+        if dt > 1 / 30: profiler.record("ui.frame_lento", dt * 1000)
+    # Al salir o pasar a segundo plano no dejamos escrituras sin confirmar
+    def on_pause(self): db.flush(); return True
+    def on_stop(self):
+        for s in self.sync: s.stop()
+        db.flush()
+        if profiler: profiler.dump()
     def go_to_add(self):
         s = self.root.get_screen('add_order'); s.clear_form()
         self.root.transition.direction = 'left'; self.root.current = 'add_order'
@@ -1245,27 +1369,43 @@ class PollosApp(MDApp):
     def delete_order(self, oid): db.delete_order(oid); self.refresh_home()
     
     # HISTORY NAVIGATION
-    def go_to_history_menu(self): self.root.transition.direction = 'left'; self.root.current = 'history_menu'
+    def go_to_history_menu(self): self.get_screen('history_menu'); self.root.transition.direction = 'left'; self.root.current = 'history_menu'
     def go_to_delivered(self):
-        s = self.root.get_screen('order_list'); s.mode = "delivered"; s.load_data()
+        s = self.get_screen('order_list'); s.mode = "delivered"; s.load_data()
         self.root.transition.direction = 'left'; self.root.current = 'order_list'
     def go_to_credit(self):
-        s = self.root.get_screen('order_list'); s.mode = "credit"; s.load_data()
+        s = self.get_screen('order_list'); s.mode = "credit"; s.load_data()
         self.root.transition.direction = 'left'; self.root.current = 'order_list'
-    def go_to_report(self): self.root.transition.direction = 'left'; self.root.current = 'report'
+    def go_to_report(self): self.get_screen('report'); self.root.transition.direction = 'left'; self.root.current = 'report'
     
     def confirm_clear_history(self):
         if self.root.current == 'order_list':
-            self.root.get_screen('order_list').ask_delete_mode()
+            self.get_screen('order_list').ask_delete_mode()
+
+    # MANTENIMIENTO: compactar la base a mano (las bases viejas pasan a auto_vacuum INCREMENTAL)
+    def confirm_compact(self):
+        d = MDDialog(title="¿COMPACTAR LA BASE?", text="La caja queda en pausa mientras se reescribe el archivo. Hacerlo con el local tranquilo.",
+                     buttons=[MDFlatButton(text="NO", on_release=lambda x: d.dismiss()),
+                              MDRaisedButton(text="SÍ", on_release=lambda x: (d.dismiss(), self.start_compact()))])
+        d.open()
+    def start_compact(self):
+        loader.submit("compact", self.compact_done, db.compact, on_error=lambda e: self.compact_done(None))
+    def compact_done(self, freed):
+        text = "No se pudo compactar la base." if freed is None else f"Base compactada: {freed / 1048576:.1f} MB liberados."
+        d = MDDialog(title="Mantenimiento", text=text, buttons=[MDFlatButton(text="OK", on_release=lambda x: d.dismiss())])
+        d.open()
 
     def go_home(self): self.root.transition.direction = 'right'; self.root.current = 'home'
     def cancel_add(self): self.root.transition.direction = 'right'; self.root.current = 'home'
     def refresh_home(self):
-        home = self.root.get_screen('home'); grid = home.ids.orders_grid; grid.clear_widgets()
-        orders = db.get_active_orders()
-        for o in orders:
-            c = OrderCard(); c.order_id=o[0]; c.customer_name=o[1]; c.order_details=o[2]; c.total_price=o[3]
-            grid.add_widget(c)
+        self.root.get_screen('home').loading = True
+        loader.submit("home", self.show_home, db.get_active_orders, on_error=self.home_failed)
+    def home_failed(self, error): self.root.get_screen('home').loading = False  # Queda el tablero anterior
+    @profiled(profiler, "home.refresh_home", lambda self: rv_widgets(self.root.get_screen('home').ids.orders_grid))
+    def show_home(self, orders):
+        home = self.root.get_screen('home'); home.loading = False
+        apply_board_diff(home.ids.orders_grid.data, orders)
+
 
 if __name__ == '__main__':
     PollosApp().run()
\ No newline at end of file
@@ -0,0 +1,33 @@
+# Precios del menú (Bs) y descripción de cada línea del carrito, sin Kivy
+SODA_PRICES = {"Mendocina 3L": 15, "Mendocina 1L": 7, "Coca 3L": 20, "Coca Peque": 5, "Oro Peque": 3}
+
+def item_prices(food, cut, variant, soda):
+    # Devuelve (precio comida, desc comida, precio soda, desc soda); precio 0 = no se agrega
+    fp = 0; fd = ""
+    # Si Soda está activa, ignoramos comida
+    if soda == "Ninguna" and food != "Ninguna":
+        if food == "Pollo Broaster":
+            b = 18 if cut == "Pecho" else 16
+            if variant == "Solo Papa": b += 1
+            fp = b; fd = f"Pollo {cut}"
+            if variant != "Normal (Arroz y Papa)": fd += f" [{variant}]"
+        elif food == "Pollo a la Plancha": fp = 20; fd = "Pollo Plancha"
+        elif food == "Hamburguesa": fp = 17; fd = "Hamburguesa"
+        elif food == "Salchipapa": fp = 16; fd = "Salchipapa"
+        elif food == "Solo Porción":
+            p = 4
+            if variant == "Normal (Arroz y Papa)": p = 8
+            elif variant == "Solo Papa": p = 7
+            fp = p; fd = f"Porción {variant}"
+
+    sp = 0; sd = ""
+    if soda in SODA_PRICES: sp = SODA_PRICES[soda]; sd = soda
+    return fp, fd, sp, sd
+
+def order_summary(cart, moto, delivery):
+    # (total, details) tal como se guardan en orders; moto=None si no se ingresó costo de moto
+    total = 0; details = ""
+    for i in cart: total += i['price']; details += f"{i['qty']}x {i['desc']} ({i['price']} Bs)\n"
+    if moto is not None: total += moto; details += f"Moto: {moto} Bs\n"
+    details += f"({delivery})"
+    return total, details
@@ -0,0 +1,85 @@
+import time
+import inspect
+import functools
+import logging
+import logging.handlers
+from collections import deque
+
+# Perfilado opcional (POLLOS_PROFILE=1), sin Kivy: tiempo y filas de cada llamada a Database y
+# tiempo/widgets de cada reconstrucción de pantalla. Cada muestra va a un log rotativo y cada
+# tanto se escribe el resumen con percentiles. Desactivado no se envuelve nada: costo cero.
+LOG_FILE = "pollos_profile.log"
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def count_rows(result):
+    # Filas devueltas: listas por largo, un registro (namedtuple) = 1; lo demás no se cuenta
+    if isinstance(result, list): return len(result)
+    if hasattr(result, "_fields"): return 1
+    return None
+
+class Profiler:
+    def __init__(self, path=LOG_FILE, keep=1000):
+        # keep: últimas muestras por nombre para los percentiles
+        self.samples = {}; self.keep = keep
+        self.log = logging.getLogger("pollos.profile"); self.log.setLevel(logging.INFO); self.log.propagate = False
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=1024 * 1024, backupCount=3, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(threadName)s %(message)s"))
+        self.log.addHandler(handler)
+
+    def record(self, name, ms, rows=None, widgets=None):
+        q = self.samples.get(name)
+        if q is None: q = self.samples.setdefault(name, deque(maxlen=self.keep))
+        q.append(ms)
+        extra = "".join(f" {k}={v}" for k, v in (("rows", rows), ("widgets", widgets)) if v is not None)
+        self.log.info(f"{name} {ms:.2f}ms{extra}")
+
+    def report(self):
+        lines = [f"{'llamada':<36}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9} ms"]
+        for name, q in sorted(self.samples.items()):
+            v = sorted(q)
+            if v: lines.append(f"{name:<36}{len(v):>6}" + "".join(f"{x:>9.2f}" for x in (percentile(v, 50), percentile(v, 95), percentile(v, 99), v[-1])))
+        return lines
+
+    def dump(self, *args):
+        self.log.info("RESUMEN\n" + "\n".join(self.report()))
+
+def timed_call(profiler, name, fn):
+    if inspect.isgeneratorfunction(fn):
+        # Generadores (ej. iter_report_rows): se mide hasta agotarlos, no solo la creación
+        @functools.wraps(fn)
+        def gen(*args, **kwargs):
+            t = time.perf_counter(); n = 0
+            try:
+                for row in fn(*args, **kwargs): n += 1; yield row
+            finally: profiler.record(name, (time.perf_counter() - t) * 1000, n)
+        return gen
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter(); result = fn(*args, **kwargs)
+        profiler.record(name, (time.perf_counter() - t) * 1000, count_rows(result))
+        return result
+    return wrapper
+
+def instrument(cls, profiler, prefix="db", skip=()):
+    # Envuelve los métodos públicos de la clase (incluye la espera del lock, que es lo que congela la UI)
+    for name, fn in list(vars(cls).items()):
+        if not name.startswith("_") and name not in skip and inspect.isfunction(fn):
+            setattr(cls, name, timed_call(profiler, f"{prefix}.{name}", fn))
+
+def profiled(profiler, name, widgets=None):
+    # Decorador para las reconstrucciones de pantalla; widgets(self) cuenta lo que quedó en pantalla y
+    # corre dentro del tiempo medido (puede terminar trabajo que la pantalla dejó para el próximo frame).
+    # Sin profiler devuelve la función tal cual.
+    def deco(fn):
+        if profiler is None: return fn
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            t = time.perf_counter(); result = fn(self, *args, **kwargs)
+            n = widgets(self) if widgets else None
+            profiler.record(name, (time.perf_counter() - t) * 1000, widgets=n)
+            return result
+        return wrapper
+    return deco
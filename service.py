@@ -0,0 +1,63 @@
+from database import Database, PAGE_SIZE, export_report, load_report, report_ranges
+from pricing import item_prices, order_summary
+
+# Reglas del negocio sin Kivy: precios, carrito, filtros del reporte y cobros.
+# Las pantallas solo leen widgets y llaman acá; benchmarks, servidor o CLI usan la misma API.
+PAYMENT_METHODS = ("EFECTIVO", "QR")
+CLOSE_METHODS = PAYMENT_METHODS + ("FIADO",)  # Al cerrar un pedido activo también se puede fiar
+
+def parse_moto(text):
+    # Costo de moto escrito por el cajero; None si está vacío o no es un número
+    try: return float(text)
+    except (TypeError, ValueError): return None
+
+class OrderService:
+    def __init__(self, db=None):
+        self.db = db if db is not None else Database()
+
+    # --- PRECIOS Y CARRITO ---
+    def prices(self, food, cut, variant, soda):
+        return item_prices(food, cut, variant, soda)
+
+    def cart_lines(self, food, cut, variant, soda, qty_food=1, qty_soda=1):
+        # Líneas que agrega "AGREGAR" (0, 1 o 2: comida y/o soda)
+        fp, fd, sp, sd = item_prices(food, cut, variant, soda); lines = []
+        if fp > 0: q = int(qty_food); lines.append({"qty": q, "desc": fd, "unit_price": fp, "price": fp * q})
+        if sp > 0: q = int(qty_soda); lines.append({"qty": q, "desc": sd, "unit_price": sp, "price": sp * q})
+        return lines
+
+    def cart_total(self, cart, moto_text=""):
+        return sum(i['price'] for i in cart) + (parse_moto(moto_text) or 0)
+
+    def save_order(self, name, cart, delivery, moto_text="", order_id=None):
+        # Alta o edición; devuelve el id del pedido (None si el carrito está vacío)
+        if not cart: return None
+        moto = parse_moto(moto_text)
+        total, details = order_summary(cart, moto, delivery)
+        if order_id:
+            self.db.update_order(order_id, name or "Cliente", details, total, delivery, moto or 0, cart); return order_id
+        return self.db.add_order(name or "Cliente", details, total, delivery, moto or 0, cart)
+
+    # --- COBROS ---
+    def close_order(self, order_id, method):
+        # ACTIVO -> ENTREGADO (EFECTIVO/QR) o FIADO
+        if method not in CLOSE_METHODS: raise ValueError(f"Método de pago inválido: {method}")
+        self.db.mark_delivered(order_id, method)
+
+    def settle_credit(self, order_id, method):
+        # FIADO -> ENTREGADO
+        if method not in PAYMENT_METHODS: raise ValueError(f"Método de pago inválido: {method}")
+        self.db.pay_credit_order(order_id, method)
+
+    # --- FILTROS Y REPORTE ---
+    def report_ranges(self, sel_filter, sel_day, sel_month, sel_year, now=None):
+        return report_ranges(sel_filter, sel_day, sel_month, sel_year, now)
+
+    def report_page(self, ranges, after=None, query=""):
+        return load_report(self.db, ranges, after, query)
+
+    def list_page(self, status, after=None):
+        return self.db.get_order_summaries(status, after, PAGE_SIZE)
+
+    def export(self, ranges, query, fmt, path):
+        return export_report(self.db, ranges, query, fmt, path)
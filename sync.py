@@ -0,0 +1,133 @@
+import hmac
+import json
+import time
+import sqlite3
+import threading
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from database import Logger
+
+# Sincronización LAN sin Kivy. Un dispositivo (ej. el de cocina) corre SyncServer; los demás corren
+# SyncClient apuntando a él. Solo viajan los pedidos cambiados desde la última seq conocida:
+#   POST /changes         {"changes": [...]}  el cliente sube lo que originó él (cursor local 'pushed')
+#   GET  /changes?since=N&exclude=DEV&wait=S  long-poll: vuelve apenas hay cambios con seq > N
+# El servidor es la referencia: lo que recibe queda en su registro y lo reenvía a los demás.
+# Todos los pedidos llevan el secreto compartido (POLLOS_SYNC_TOKEN) en TOKEN_HEADER; sin él, 401.
+PORT = 8765
+TOKEN_HEADER = "X-Pollos-Token"
+POLL = 0.05  # Cada cuánto se mira el registro local (push del cliente y long-poll del servidor)
+
+class SyncHandler(BaseHTTPRequestHandler):
+    def _send(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers(); self.wfile.write(body)
+
+    def _authorized(self):
+        if hmac.compare_digest(self.headers.get(TOKEN_HEADER, "").encode("utf-8"), self.server.token.encode("utf-8")): return True
+        self._send(401, {"error": "token inválido"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized(): return
+        url = urlparse(self.path); q = parse_qs(url.query)
+        if url.path != "/changes": return self._send(404, {"error": "no existe"})
+        db = self.server.db
+        try:
+            since = int(q.get("since", ["0"])[0]); exclude = q.get("exclude", [None])[0]
+            deadline = time.monotonic() + min(float(q.get("wait", ["0"])[0]), 30)
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        while True:
+            seq, changes = db.changes_since(since, exclude=exclude)
+            if seq > since or time.monotonic() >= deadline: break
+            time.sleep(POLL)
+        self._send(200, {"device": db.device, "seq": seq, "changes": changes})
+
+    def do_POST(self):
+        if not self._authorized(): return
+        if urlparse(self.path).path != "/changes": return self._send(404, {"error": "no existe"})
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            n = self.server.db.apply_changes(data.get("changes", []))
+        except (ValueError, KeyError, TypeError, sqlite3.IntegrityError) as e:
+            return self._send(400, {"error": str(e)})  # Lote inválido: apply_changes ya lo descartó entero
+        except sqlite3.Error as e:
+            Logger.exception(f"Pollos: sync no pudo aplicar un lote: {e}")
+            return self._send(500, {"error": str(e)})
+        if n and self.server.on_change: self.server.on_change()
+        self._send(200, {"applied": n})
+
+    def log_message(self, fmt, *args):
+        Logger.debug("Pollos: sync " + fmt % args)
+
+class SyncServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, db, token, host="0.0.0.0", port=PORT, on_change=None):
+        # port=0 elige uno libre (servidor local de prueba); la dirección real queda en self.url
+        if not token: raise ValueError("SyncServer necesita un token (POLLOS_SYNC_TOKEN)")
+        super().__init__((host, port), SyncHandler)
+        self.db = db; self.token = token; self.on_change = on_change
+        self.url = f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="sync-server", daemon=True).start()
+        return self
+
+    def stop(self): self.shutdown(); self.server_close()
+
+class SyncClient:
+    def __init__(self, db, url, token, wait=10, on_change=None):
+        # wait: segundos que el servidor retiene el long-poll si no hay nada nuevo
+        self.db = db; self.url = url.rstrip("/"); self.token = token; self.wait = wait; self.on_change = on_change
+        self.stopped = threading.Event(); self.online = None
+        # Cursores en memoria: con write-behind lo guardado en sync_meta tarda hasta un commit en verse
+        # desde estos hilos, y releer un cursor viejo volvería a subir estados ya pisados por otros
+        self.pushed = int(db.sync_value("pushed", 0)); self.pulled = int(db.sync_value("pulled", 0))
+
+    def _request(self, path, data=None, timeout=5):
+        body = None if data is None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(self.url + path, body, {"Content-Type": "application/json", TOKEN_HEADER: self.token})
+        with urllib.request.urlopen(req, timeout=timeout) as r: return json.loads(r.read())
+
+    def _status(self, online, error=None):
+        # Se loguea solo el cambio de estado, no cada reintento
+        if online != self.online:
+            if online: Logger.info(f"Pollos: sincronizando con {self.url}")
+            else: Logger.warning(f"Pollos: sin conexión con {self.url} ({error})")
+        self.online = online
+
+    def push(self):
+        # Sube los cambios originados en este dispositivo; devuelve cuántos subió
+        seq, changes = self.db.changes_since(self.pushed, origin=self.db.device)
+        if changes: self._request("/changes", {"changes": changes})
+        if seq > self.pushed: self.pushed = seq; self.db.set_sync_value("pushed", seq)
+        return len(changes)
+
+    def pull(self, wait=0):
+        # Baja lo nuevo del servidor (sin lo que subió este dispositivo) y avanza el cursor en la misma transacción
+        res = self._request(f"/changes?since={self.pulled}&exclude={self.db.device}&wait={wait}", timeout=wait + 5)
+        n = 0
+        if res["seq"] > self.pulled: n = self.db.apply_changes(res["changes"], ("pulled", res["seq"])); self.pulled = res["seq"]
+        if n and self.on_change: self.on_change()
+        return n
+
+    def _loop(self, step, pause):
+        while not self.stopped.is_set():
+            try: step(); self._status(True)
+            except (OSError, urllib.error.URLError, ValueError) as e:
+                if self.stopped.is_set(): return
+                self._status(False, e); self.stopped.wait(2); continue
+            if pause: self.stopped.wait(pause)
+
+    def start(self):
+        threading.Thread(target=self._loop, args=(self.push, POLL), name="sync-push", daemon=True).start()
+        threading.Thread(target=self._loop, args=(lambda: self.pull(self.wait), 0), name="sync-pull", daemon=True).start()
+        return self
+
+    def stop(self): self.stopped.set()